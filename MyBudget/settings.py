@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.CachedAuthenticationMiddleware',
+    'main.middleware.TimezoneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -55,7 +58,8 @@ ROOT_URLCONF = 'MyBudget.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга для PerformanceMiddleware
+        'BACKEND': 'main.templating.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
         'APP_DIRS': True,
@@ -71,18 +75,120 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'MyBudget.wsgi.application'
 
+# Асинхронные index и reports (views.index_async / reports_async) для запуска через
+# ASGI (MyBudget.asgi:application, например gunicorn -k uvicorn.workers.UvicornWorker).
+# Под WSGI оставьте выключенным: async-представление там выполняется через async_to_sync.
+ASYNC_VIEWS = os.environ.get('MYBUDGET_ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite в режиме WAL: читатели не ждут писателя, а писатели при блокировке ждут до
+# timeout секунд вместо «database is locked». Транзакции atomic() открываются как
+# BEGIN IMMEDIATE — блокировка на запись берётся сразу, а не при первой записи, когда
+# её уже нельзя дождаться без отката. Соединение живёт CONN_MAX_AGE секунд между запросами.
+# Проверка под нагрузкой: python manage.py stress_db.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+        },
+        # тестовая БД в файле, а не в памяти: её должны видеть процессы run_jobs в тестах
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Кэш посчитанных данных пользователей (main/datacache.py). LocMemCache ограничен
+# MAX_ENTRIES и вытесняет давно не читанные ключи (LRU); для общего кэша между
+# воркерами можно взять FileBasedCache или DatabaseCache — версия данных всё равно в БД.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mybudget',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+    # сессии (SESSION_ENGINE cached_db) — общий для воркеров кэш на диске: выход в одном
+    # воркере не должен оставлять сессию живой в памяти другого
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'sessions',
+        'TIMEOUT': 60 * 60 * 24 * 14,
+    },
+}
+
+
+# Sessions, messages and authentication
+# MYBUDGET_SESSIONS выбирает хранилище сессий:
+#   cached_db (по умолчанию) — чтение из кэша 'sessions', запись в кэш и django_session;
+#   signed_cookies — сессия целиком в подписанной cookie, таблица django_session не нужна
+#   (выйти на всех устройствах нельзя — старая cookie действует до SESSION_COOKIE_AGE);
+#   db — как было, запрос к django_session на каждый запрос.
+# Сообщения (messages.success/error) хранятся в cookie и не перезаписывают сессию.
+# Пользователь запроса берётся из кэша процесса на USER_CACHE_SECONDS (main/authcache.py),
+# 0 — читать auth_user на каждом запросе. Сравнение режимов: python manage.py benchmark_sessions.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.environ.get('MYBUDGET_SESSIONS', 'cached_db')
+SESSION_CACHE_ALIAS = 'sessions'
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+USER_CACHE_SECONDS = 30
+
+
+# Performance metrics
+# PerformanceMiddleware пишет в лог main.performance SQL запросов дольше SLOW_REQUEST_MS
+# (None — не писать). Гистограммы по view отдаются staff-пользователям на /metrics.
+
+SLOW_REQUEST_MS = 1000
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'main.performance': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
+# Background jobs
+# Импорт, фоновая выгрузка и пересборка итогов выполняются вне запроса (main/jobs.py):
+# python manage.py run_jobs --workers N. Файлы задач лежат в JOBS_DIR.
+# MYBUDGET_JOBS_INLINE=1 — выполнять задачу прямо в запросе (разработка без воркера).
+
+JOBS_DIR = BASE_DIR / 'jobs'
+JOBS_INLINE = os.environ.get('MYBUDGET_JOBS_INLINE') == '1'
+
+
+# Captcha
+# Сколько готовых капч (строка в БД + PNG в кэше) держит каждый процесс (main/captchapool.py);
+# пул пополняется только взамен выданных. 0 — создавать капчу при каждом открытии регистрации.
+
+CAPTCHA_POOL_SIZE = 3
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -109,6 +215,9 @@ LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'UTC'
 
+# Зона новых пользователей; свою каждый задаёт в профиле (Profile.timezone, main/usertz.py)
+DEFAULT_USER_TIME_ZONE = 'Asia/Bishkek'
+
 USE_I18N = True
 
 USE_TZ = True
@@ -121,6 +230,18 @@ STATIC_URL = 'static/'
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Имена с хэшем содержимого и копии .gz/.br рядом (main/assets.py); отдаёт их views.static_file.
+# После обновления статики: python manage.py collectstatic --noinput
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'main.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from main.views import static_file
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(rf'^{settings.STATIC_URL.strip("/")}/(?P<path>.+)$', static_file, name='static'),
     path('', include('main.urls')),
-    path('captcha/', include('captcha.urls')),
-]
\ No newline at end of file
+    # captcha.urls не подключаются: картинки капчи отдаёт main:captcha_image из пула,
+    # а импорт captcha.views тянул Pillow в каждый воркер при загрузке URLconf
+]
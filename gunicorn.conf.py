@@ -0,0 +1,52 @@
+"""Профиль gunicorn для продакшена. Файл подхватывается из текущего каталога:
+
+    gunicorn MyBudget.wsgi
+
+Воркеры gthread: запросы в основном ждут SQLite и кэш, потоки дешевле процессов.
+preload_app — Django, URLconf и представления (с numpy) импортируются один раз в мастере,
+воркеры получают их готовыми через fork, поэтому новый воркер (масштабирование, замена
+по max_requests, перезапуск) отвечает почти сразу. Замеры: manage.py benchmark_startup.
+Любую настройку можно переопределить переменной окружения GUNICORN_<ИМЯ> или ключом CLI.
+"""
+import multiprocessing
+import os
+
+
+def _env(name, default, cast=int):
+    value = os.environ.get(f'GUNICORN_{name.upper()}')
+    return default if value is None else cast(value)
+
+
+bind = _env('bind', '0.0.0.0:8000', str)
+workers = _env('workers', multiprocessing.cpu_count() * 2 + 1)
+worker_class = 'gthread'
+threads = _env('threads', 4)
+preload_app = _env('preload_app', True, lambda value: value.lower() not in ('0', 'false', 'no'))
+
+# воркер перезапускается после max_requests запросов (утечки памяти не копятся);
+# jitter разносит перезапуски, чтобы воркеры не уходили одновременно
+max_requests = _env('max_requests', 2000)
+max_requests_jitter = _env('max_requests_jitter', 200)
+
+timeout = _env('timeout', 30)  # импорт и выгрузка идут фоновыми задачами (run_jobs), запросы короткие
+graceful_timeout = _env('graceful_timeout', 30)
+keepalive = _env('keepalive', 5)
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # до создания воркеров: URLconf загружается лениво, при первом запросе — загружаем
+    # его в мастере, чтобы импорт представлений не повторялся в каждом воркере
+    if server.cfg.preload_app:
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+
+
+def post_fork(server, worker):
+    # соединение с БД, если мастер успел его открыть, не должно делиться между процессами
+    # (без preload_app Django в воркере ещё не загружен)
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
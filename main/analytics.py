@@ -0,0 +1,174 @@
+"""Тренды и прогнозы по дневным итогам (DailyRollup) на массивах NumPy.
+
+Дневные суммы пользователя за последние HISTORY_DAYS дней читаются одним запросом и
+раскладываются в плотные массивы (доходы и расходы по дням, расходы категория × день).
+Скользящие средние, темпы расходов по всем категориям и сроки достижения всех целей
+считаются векторно, без циклов по дням. Результат кэшируется по версии данных
+пользователя (main/datacache.py) и пересчитывается только после изменений.
+"""
+import calendar
+from datetime import date, timedelta
+
+import numpy as np
+
+from . import datacache
+from .models import DailyRollup, Goal
+
+HISTORY_DAYS = 180
+RATE_DAYS = 30  # окно для темпа доходов и расходов (прогноз месяца, категории)
+SAVING_DAYS = 90  # окно для темпа накоплений (прогноз целей)
+TREND_DAYS = 90  # длина графика скользящих средних
+WINDOWS = (7, 30)  # окна скользящих средних, дней
+DAYS_PER_MONTH = 365.25 / 12
+
+
+def _rows(user, start, end):
+    return DailyRollup.objects.filter(user=user, day__range=(start, end)).values_list(
+        'day', 'type', 'category_id', 'category__name', 'category__monthly_limit', 'total',
+    )
+
+
+def _goals(user):
+    return Goal.objects.filter(user=user).order_by('deadline', 'id').values_list(
+        'id', 'target_amount', 'current_amount', 'deadline',
+    )
+
+
+def moving_average(values, window):
+    """Скользящее среднее за window дней; в первых днях — среднее за доступные дни."""
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    return (sums[end] - sums[start]) / (end - start)
+
+
+def _history(rows, start, days):
+    """Плотные массивы по дням: доходы, расходы и расходы по категориям (категория × день)."""
+    income, expense = np.zeros(days), np.zeros(days)
+    categories = {}  # id -> (название, лимит)
+    if not rows:
+        return income, expense, [], np.zeros((0, days))
+
+    day, type_, category_id, name, limit, total = zip(*rows)
+    offset = np.array([(d - start).days for d in day])
+    total = np.array(total, dtype=float)
+    is_income = np.array(type_) == 'income'
+    np.add.at(income, offset[is_income], total[is_income])
+    np.add.at(expense, offset[~is_income], total[~is_income])
+
+    # расходы без категории в разбивку не попадают
+    in_category = ~is_income & np.array([c is not None for c in category_id])
+    for c, n, lim, is_expense in zip(category_id, name, limit, in_category.tolist()):
+        if is_expense:
+            categories[c] = (n, lim)
+    ids = list(categories)
+    index = {c: i for i, c in enumerate(ids)}
+    row = np.array([index.get(c, -1) for c in category_id])
+    by_category = np.zeros((len(ids), days))
+    np.add.at(by_category, (row[in_category], offset[in_category]), total[in_category])
+    return income, expense, [(c, *categories[c]) for c in ids], by_category
+
+
+def compute(rows, goals, today, balance):
+    """Прогноз по строкам дневных итогов rows и целям goals (см. _rows, _goals)."""
+    start = today - timedelta(days=HISTORY_DAYS - 1)
+    income, expense, categories, by_category = _history(list(rows), start, HISTORY_DAYS)
+
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    elapsed, remaining = today.day, days_in_month - today.day
+    income_rate, expense_rate = float(income[-RATE_DAYS:].mean()), float(expense[-RATE_DAYS:].mean())
+    net = income - expense
+
+    trend_start = HISTORY_DAYS - TREND_DAYS
+    trend = {
+        'labels': [(start + timedelta(days=int(i))).strftime('%d.%m') for i in range(trend_start, HISTORY_DAYS)],
+        'net': [round(x, 2) for x in moving_average(net, WINDOWS[1])[trend_start:].tolist()],
+    }
+    for window in WINDOWS:
+        trend[f'expense_ma{window}'] = [
+            round(x, 2) for x in moving_average(expense, window)[trend_start:].tolist()
+        ]
+
+    month = {
+        'income': round(float(income[-elapsed:].sum()) + income_rate * remaining, 2),
+        'expenses': round(float(expense[-elapsed:].sum()) + expense_rate * remaining, 2),
+        'balance': round(float(balance) + (income_rate - expense_rate) * remaining, 2),
+        'days_left': remaining,
+    }
+
+    # все категории сразу: темп (в день) за RATE_DAYS и прогноз расходов на месяц
+    rates = by_category[:, -RATE_DAYS:].mean(axis=1)
+    projected = by_category[:, -elapsed:].sum(axis=1) + rates * remaining
+    limits = np.array([np.nan if lim is None else float(lim) for _, _, lim in categories])
+    over = np.nan_to_num(projected - limits, nan=0.0)
+    category_rates = [
+        {
+            'id': c, 'name': name, 'monthly_rate': round(rate * DAYS_PER_MONTH, 2),
+            'projected': round(p, 2), 'limit': None if lim is None else float(lim), 'over': round(o, 2),
+        }
+        for (c, name, lim), rate, p, o in zip(categories, rates.tolist(), projected.tolist(), over.tolist())
+        if p or rate
+    ]
+    category_rates.sort(key=lambda row: -row['projected'])
+
+    return {
+        'trend': trend,
+        'month': month,
+        'categories': category_rates,
+        'goals': _goal_forecast(list(goals), float(net[-SAVING_DAYS:].mean()), today),
+    }
+
+
+def _goal_forecast(goals, saving_rate, today):
+    """Даты достижения целей при текущем темпе накоплений (в день).
+
+    Накопления идут в цели по очереди сроков: цель достигается, когда накоплено
+    всё недостающее для неё и для всех целей с более ранним сроком.
+    """
+    result = {'saving_rate': round(saving_rate * DAYS_PER_MONTH, 2), 'by_goal': {}}
+    if not goals:
+        return result
+    ids, target, current, deadline = zip(*goals)
+    missing = np.maximum(np.array(target, dtype=float) - np.array(current, dtype=float), 0)
+    queue = np.cumsum(missing)
+    if saving_rate > 0:
+        days = np.ceil(queue / saving_rate)
+    else:
+        days = np.full(len(ids), np.inf)
+    days_to_deadline = np.array([(d - today).days for d in deadline])
+    # сколько нужно откладывать в месяц, чтобы успеть к сроку (с учётом целей раньше)
+    needed = queue / np.maximum(days_to_deadline, 1) * DAYS_PER_MONTH
+
+    for goal_id, left, d, dl, need in zip(ids, missing.tolist(), days.tolist(), deadline, needed.tolist()):
+        if not left:
+            eta = today
+        elif np.isfinite(d) and d <= (date.max - today).days:
+            eta = today + timedelta(days=int(d))
+        else:
+            # нет накоплений или при почти нулевом темпе срок уходит за date.max — недостижима
+            eta = None
+        result['by_goal'][goal_id] = {
+            'eta': eta,
+            'on_track': eta is not None and eta <= dl,
+            'monthly_needed': round(need, 2),
+        }
+    return result
+
+
+def forecast(user, today, balance, version=None):
+    """Тренды, прогноз месяца, темпы категорий и сроки целей (см. compute), из кэша."""
+    start = today - timedelta(days=HISTORY_DAYS - 1)
+    return datacache.cached(
+        user, 'forecast', lambda: compute(_rows(user, start, today), _goals(user), today, balance),
+        (today,), version,
+    )
+
+
+async def aforecast(user, today, balance, version=None):
+    start = today - timedelta(days=HISTORY_DAYS - 1)
+
+    async def compute_async():
+        rows = [row async for row in _rows(user, start, today)]
+        goals = [goal async for goal in _goals(user)]
+        return compute(rows, goals, today, balance)
+    return await datacache.acached(user, 'forecast', compute_async, (today,), version)
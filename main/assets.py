@@ -0,0 +1,88 @@
+"""Статика с хэшем содержимого в имени, заранее сжатая в gzip и brotli.
+
+collectstatic через CompressedManifestStaticFilesStorage кладёт рядом с каждым
+файлом с хэшем в имени (bootstrap.min.3f2a….css) его сжатые копии .gz и .br.
+static_file отдаёт лучшую копию, которую принимает браузер (Accept-Encoding),
+а файлы с хэшем в имени — с Cache-Control immutable на год. При повторном
+открытии страницы браузер не запрашивает их вообще.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # без пакета Brotli остаётся только gzip
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map'}
+MIN_SIZE = 512  # байт: мелкие файлы сжатие почти не уменьшает
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        # collectstatic ещё не запускали (разработка, тесты) — ссылаемся на исходное имя
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            compress(self.path(name))
+
+
+def compress(path):
+    """Пишет path.gz и path.br, если сжатие заметно уменьшает файл."""
+    if os.path.splitext(path)[1] not in COMPRESSIBLE or os.path.getsize(path) < MIN_SIZE:
+        return
+    with open(path, 'rb') as f:
+        data = f.read()
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    for suffix, content in variants.items():
+        if len(content) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(content)
+
+
+# порядок предпочтения: brotli сжимает текст лучше gzip
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def find(path, accept_encoding=''):
+    """(путь к файлу, Content-Encoding или None, Cache-Control) для запрошенного имени.
+
+    Сначала ищется в STATIC_ROOT (после collectstatic), иначе — в static/ приложений.
+    None, если файла нет.
+    """
+    root = os.path.realpath(settings.STATIC_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        full = finders.find(path)
+        if not full:
+            return None
+        return full, None, 'no-cache'
+
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.split(',')}
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if name in accepted and os.path.isfile(full + suffix):
+            full, encoding = full + suffix, name
+            break
+    cache_control = IMMUTABLE if HASHED_NAME.search(path) else 'no-cache'
+    return full, encoding, cache_control
+
+
+def content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
@@ -0,0 +1,76 @@
+"""Кэш пользователя запроса в памяти процесса.
+
+Стандартный AuthenticationMiddleware на каждом запросе читает auth_user по id из сессии.
+Здесь найденный пользователь запоминается на USER_CACHE_SECONDS секунд по ключу из данных
+сессии (id, бэкенд, хэш пароля), так что повторные запросы той же сессии обходятся без SQL.
+Смена пароля меняет хэш в новых сессиях; сохранение или удаление User сбрасывает записи
+этого процесса, а в других воркерах запись живёт не дольше USER_CACHE_SECONDS.
+"""
+import copy
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+MAX_ENTRIES = 1000
+
+_lock = threading.Lock()
+_users = {}
+
+
+def _ttl():
+    return getattr(settings, 'USER_CACHE_SECONDS', 30)
+
+
+def get_user(request):
+    """Пользователь сессии, как auth.get_user, но без запроса к auth_user при попадании в кэш."""
+    session = request.session
+    try:
+        key = (
+            session[auth.SESSION_KEY],
+            session[auth.BACKEND_SESSION_KEY],
+            session.get(auth.HASH_SESSION_KEY, ''),
+        )
+    except KeyError:
+        return AnonymousUser()
+    ttl = _ttl()
+    if ttl:
+        entry = _users.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            # копия: представления могут менять атрибуты request.user
+            return copy.copy(entry[1])
+
+    user = auth.get_user(request)
+    if ttl and user.is_authenticated:
+        with _lock:
+            if len(_users) >= MAX_ENTRIES:
+                _users.clear()
+            _users[key] = (time.monotonic() + ttl, copy.copy(user))
+    return user
+
+
+async def aget_user(request):
+    return await sync_to_async(get_user)(request)
+
+
+def invalidate(user_id):
+    """Удаляет из кэша этого процесса все записи пользователя."""
+    user_id = str(user_id)
+    with _lock:
+        for key in [key for key in _users if str(key[0]) == user_id]:
+            del _users[key]
+
+
+def clear():
+    with _lock:
+        _users.clear()
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, **kwargs):
+    invalidate(instance.pk)
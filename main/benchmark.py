@@ -0,0 +1,65 @@
+"""Общие функции бенчмарков: перцентили, сводка замеров и сравнение с базовым запуском."""
+import json
+import math
+import platform
+from datetime import datetime
+
+
+def percentile(values, p):
+    """Перцентиль p (0–100) по методу ближайшего ранга."""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+def summarize(times_ms, queries):
+    """Сводка по замерам одной страницы: время в миллисекундах и число SQL-запросов."""
+    return {
+        'runs': len(times_ms),
+        'p50_ms': round(percentile(times_ms, 50), 2),
+        'p95_ms': round(percentile(times_ms, 95), 2),
+        'p99_ms': round(percentile(times_ms, 99), 2),
+        'mean_ms': round(sum(times_ms) / len(times_ms), 2) if times_ms else 0,
+        'queries': percentile(queries, 50),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Регрессии относительно baseline: p95 медленнее больше чем на tolerance или больше запросов."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} → {current['p95_ms']} мс")
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: запросов {previous['queries']} → {current['queries']}")
+    return regressions
+
+
+def write_results(path, results, **meta):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            **meta,
+            'results': results,
+        }, f, ensure_ascii=False, indent=2)
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def format_table(results, baseline=None):
+    lines = [f"{'страница':<48}{'p50':>9}{'p95':>9}{'p99':>9}{'SQL':>6}"]
+    for name, r in results.items():
+        line = f"{name:<48}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['queries']:>6}"
+        previous = (baseline or {}).get(name)
+        if previous and previous['p50_ms']:
+            line += f"   p50 {(r['p50_ms'] / previous['p50_ms'] - 1) * 100:+.0f}%"
+        lines.append(line)
+    return '\n'.join(lines)
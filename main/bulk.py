@@ -0,0 +1,79 @@
+"""Массовые действия над транзакциями: смена категории или типа, удаление, слияние категорий.
+
+Каждое действие — один UPDATE или DELETE по выбранным транзакциям пользователя в одной
+транзакции БД. Итоги (DailyRollup, MonthlyRollup, Ledger) сдвигаются дельтами, которые
+считаются одним GROUP BY по тем же строкам до изменения (rollups.grouped), поэтому число
+запросов не зависит от того, сколько транзакций выбрано.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import ledger, rollups
+from .models import GoalContribution, Transaction
+
+
+def _moved(old, key):
+    """Дельты переноса итогов old {(day, type, category_id): [total, count]} в ключи key(day, type, category_id)."""
+    deltas = defaultdict(lambda: [0, 0])
+    for (day, type_, category_id), (total, count) in old.items():
+        for target, sign in (((day, type_, category_id), -1), (key(day, type_, category_id), 1)):
+            deltas[target][0] += sign * total
+            deltas[target][1] += sign * count
+    return deltas
+
+
+@transaction.atomic
+def recategorize(user, transactions, category):
+    """Переносит транзакции в category (None — «без категории»), возвращает число изменённых.
+
+    Категория бывает только одного типа, поэтому транзакции другого типа пропускаются.
+    """
+    rows = transactions.filter(user=user)
+    if category is not None:
+        rows = rows.filter(type=category.type).exclude(category=category)
+    else:
+        rows = rows.filter(category__isnull=False)
+    category_id = category.id if category else None
+    old = rollups.grouped(rows)
+    count = rows.update(category=category)
+    rollups.apply_deltas(user.id, _moved(old, lambda day, type_, _: (day, type_, category_id)))
+    return count
+
+
+@transaction.atomic
+def change_type(user, transactions, type_):
+    """Меняет тип транзакций; категория прежнего типа снимается. Возвращает число изменённых."""
+    rows = transactions.filter(user=user).exclude(type=type_)
+    old = rollups.grouped(rows)
+    count = rows.update(type=type_, category=None)
+    rollups.apply_deltas(user.id, _moved(old, lambda day, *_: (day, type_, None)))
+    return count
+
+
+@transaction.atomic
+def delete(user, transactions):
+    """Удаляет транзакции, возвращает их число."""
+    rows = transactions.filter(user=user)
+    old = rollups.grouped(rows)
+    # ссылки пополнений целей снимаются одним UPDATE; иначе delete() выбирает строки и удаляет
+    # их пачками (on_delete=SET_NULL), и число запросов растёт с выборкой
+    GoalContribution.objects.filter(transaction__in=rows).update(transaction=None)
+    rows._raw_delete(rows.db)
+    rollups.apply_deltas(user.id, {key: [-total, -count] for key, (total, count) in old.items()})
+    return sum(count for _, count in old.values())
+
+
+@transaction.atomic
+def merge_categories(user, source, target):
+    """Переносит все транзакции и итоги категории source в target и удаляет source.
+
+    Доходы и расходы не меняются — только версия данных для кэшей.
+    """
+    if source.user_id != user.id or target.user_id != user.id or source.type != target.type:
+        raise ValueError('Категории должны быть одного пользователя и одного типа')
+    count = Transaction.objects.filter(user=user, category=source).update(category=target)
+    rollups.move_category(user, source.id, target.id)
+    source.delete()
+    ledger.bump(user.id)
+    return count
@@ -0,0 +1,145 @@
+"""Пул заранее сгенерированных капч для страницы регистрации.
+
+В процессе лежит небольшая очередь (до POOL_SIZE) готовых капч: строка CaptchaStore уже
+записана, PNG уже отрисован и лежит в кэше. Запрос страницы забирает ключ из очереди, а
+картинка отдаётся из кэша без Pillow. Пул пополняется фоновым потоком только после того,
+как из него взяли капчу, — на место взятой; капчи, которые никто не запросил, истекают и
+не пересоздаются, поэтому без трафика пул не тратит ни CPU, ни записей в БД. Тот же поток
+при пополнении (не чаще раза в REAP_INTERVAL секунд) удаляет просроченные строки одним
+DELETE, поэтому таблица captcha_captchastore не растёт от ботов, которые открывают
+/register/ и не отправляют форму (без трафика — manage.py reap_captchas по расписанию).
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from captcha.conf import settings as captcha_settings
+from captcha.models import CaptchaStore
+from captcha.views import captcha_image
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = 'default'
+POOL_SIZE = getattr(settings, 'CAPTCHA_POOL_SIZE', 3)  # 0 — без пула, капча создаётся в запросе
+REAP_INTERVAL = 60  # секунд между удалениями просроченных строк
+MIN_TTL = timedelta(minutes=1)  # капчу, которой осталось жить меньше, не выдаём
+
+_queue = queue.Queue(maxsize=max(POOL_SIZE, 1))
+_wakeup = threading.Event()
+_lock = threading.Lock()
+_worker = None
+
+
+def _lifetime():
+    return timedelta(minutes=int(captcha_settings.CAPTCHA_TIMEOUT))
+
+
+def _image_key(hashkey):
+    return f'captcha:png:{hashkey}'
+
+
+def take():
+    """Ключ свободной капчи: из пула, а если он пуст — созданной на месте.
+
+    В обоих случаях фоновый поток дополняет пул до POOL_SIZE.
+    """
+    if not POOL_SIZE:
+        return _generate()[0]
+    _ensure_worker()
+    deadline = timezone.now() + MIN_TTL
+    try:
+        while True:
+            hashkey, expires = _queue.get_nowait()
+            if expires > deadline:
+                return hashkey
+            # почти просроченная капча просто выбрасывается, строку удалит reap
+    except queue.Empty:
+        return _generate()[0]
+    finally:
+        _wakeup.set()
+
+
+def image(hashkey):
+    """PNG капчи: из кэша, а для ключа не из этого процесса — отрисовка по строке в БД.
+    None, если капчи нет (просрочена или уже использована)."""
+    cache = caches[CACHE_ALIAS]
+    png = cache.get(_image_key(hashkey))
+    if png is None:
+        png = _render(hashkey)
+        if png is not None:
+            cache.set(_image_key(hashkey), png, _lifetime().total_seconds())
+    return png
+
+
+def discard(hashkey):
+    """Удаляет использованную капчу: одна капча — одна попытка."""
+    CaptchaStore.objects.filter(hashkey=hashkey).delete()
+    caches[CACHE_ALIAS].delete(_image_key(hashkey))
+
+
+def reap():
+    """Удаляет все просроченные капчи одним запросом, возвращает их число."""
+    deleted, _ = CaptchaStore.objects.filter(expiration__lte=timezone.now()).delete()
+    return deleted
+
+
+def refill():
+    """Выбрасывает из очереди почти просроченные капчи и дополняет её до POOL_SIZE (после take)."""
+    deadline = timezone.now() + MIN_TTL
+    fresh = []
+    while True:
+        try:
+            fresh.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    for hashkey, expires in fresh:
+        if expires > deadline:
+            _queue.put_nowait((hashkey, expires))
+    while not _queue.full():
+        _queue.put_nowait(_generate())
+
+
+def _generate():
+    expires = timezone.now() + _lifetime()
+    hashkey = CaptchaStore.generate_key()
+    png = _render(hashkey)
+    caches[CACHE_ALIAS].set(_image_key(hashkey), png, _lifetime().total_seconds())
+    return hashkey, expires
+
+
+def _render(hashkey):
+    response = captcha_image(None, hashkey)
+    return response.content if response.status_code == 200 else None
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _lock:
+        # после fork (gunicorn --preload) поток родителя в воркере уже не работает
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='captcha-pool', daemon=True)
+            _worker.start()
+
+
+def _run():
+    next_reap = timezone.now()
+    while True:
+        # спит, пока из пула не возьмут капчу: без трафика поток ничего не делает
+        _wakeup.wait()
+        _wakeup.clear()
+        try:
+            refill()
+            if timezone.now() >= next_reap:
+                reap()
+                next_reap = timezone.now() + timedelta(seconds=REAP_INTERVAL)
+        except Exception:
+            logger.exception('Не удалось пополнить пул капч')
+        finally:
+            connection.close()
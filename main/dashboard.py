@@ -0,0 +1,193 @@
+"""Данные главной страницы и отчётов, закэшированные по версии данных пользователя.
+
+У каждой функции есть асинхронный вариант с префиксом a (для index_async и reports_async):
+те же ключи кэша, но запросы идут через асинхронный API ORM.
+"""
+from datetime import timedelta
+
+from django.db.models import F, FilteredRelation, Q, Sum
+from django.utils import timezone
+
+from . import datacache
+from .ledger import cents
+from .models import Category, DailyRollup, Goal, MonthlyRollup, Transaction
+from .rollups import month_of
+from .timeseries import aincome_expense_series, income_expense_series
+
+
+def _chart_series(data):
+    return {
+        'labels': data['labels'],
+        'income': [float(x) for x in data['income']],
+        'expense': [float(x) for x in data['expense']],
+    }
+
+
+def series(user, start, end, step='day', version=None):
+    """Доходы/расходы по корзинам за [start, end] в виде, готовом для Chart.js."""
+    return datacache.cached(
+        user, 'series',
+        lambda: _chart_series(income_expense_series(user, start, end, step)),
+        (start, end, step), version,
+    )
+
+
+async def aseries(user, start, end, step='day', version=None):
+    async def compute():
+        return _chart_series(await aincome_expense_series(user, start, end, step))
+    return await datacache.acached(user, 'series', compute, (start, end, step), version)
+
+
+TOP_CATEGORIES = 8  # категорий в разбивке; остальные складываются в «Прочие»
+
+
+def _category_rows(user, start, end):
+    """Суммы по категориям за [start, end]: целые месяцы — из MonthlyRollup, неполные края — из DailyRollup.
+
+    Период за год — это около дюжины месячных строк на категорию и дни по краям,
+    а не сотни дневных строк.
+    """
+    first = start if start.day == 1 else month_of(month_of(start) + timedelta(days=31))
+    boundary = month_of(end + timedelta(days=1))  # месяцы [first, boundary) лежат в периоде целиком
+    if first >= boundary:
+        first = boundary = end + timedelta(days=1)
+    fields = ('type', 'category_id', 'category__name')
+    return [
+        MonthlyRollup.objects
+        .filter(user=user, month__gte=first, month__lt=boundary)
+        .values(*fields).annotate(total=Sum('total')).order_by(),
+        DailyRollup.objects
+        .filter(Q(day__gte=start, day__lt=first) | Q(day__gte=boundary, day__lte=end), user=user)
+        .values(*fields).annotate(total=Sum('total')).order_by(),
+    ]
+
+
+def _category_totals(rows, top=TOP_CATEGORIES):
+    """Разбивка по id категории (одноимённые категории не сливаются): top крупнейших и «Прочие»."""
+    sums = {}
+    for row in rows:
+        key = (row['type'], row['category_id'])
+        name = row['category__name'] or 'Без категории'
+        sums[key] = (name, sums.get(key, (name, 0))[1] + cents(row['total']))
+
+    result = {}
+    for type_ in ('income', 'expense'):
+        ranked = sorted(
+            ((category_id, name, total) for (t, category_id), (name, total) in sums.items() if t == type_ and total),
+            key=lambda item: -item[2],
+        )
+        if len(ranked) > top:
+            ranked[top:] = [(None, 'Прочие', sum(total for _, _, total in ranked[top:]))]
+        result[type_] = {
+            'ids': [category_id for category_id, _, _ in ranked],
+            'labels': [name for _, name, _ in ranked],
+            'totals': [float(total) for _, _, total in ranked],
+        }
+    return result
+
+
+def categories(user, start, end, version=None):
+    """Суммы по категориям за [start, end] отдельно для доходов и расходов (см. _category_totals)."""
+    return datacache.cached(
+        user, 'categories',
+        lambda: _category_totals(row for rows in _category_rows(user, start, end) for row in rows),
+        (start, end, TOP_CATEGORIES), version,
+    )
+
+
+async def acategories(user, start, end, version=None):
+    async def compute():
+        return _category_totals([row for rows in _category_rows(user, start, end) async for row in rows])
+    return await datacache.acached(user, 'categories', compute, (start, end, TOP_CATEGORIES), version)
+
+
+async def aperiod_totals(user, start, end, version=None):
+    """Доходы, расходы и баланс за [start, end] одним агрегатом по дневным итогам."""
+    async def compute():
+        totals = await DailyRollup.objects.filter(user=user, day__range=(start, end)).aaggregate(
+            income=Sum('total', filter=Q(type='income')),
+            expenses=Sum('total', filter=Q(type='expense')),
+        )
+        income, expenses = float(totals['income'] or 0), float(totals['expenses'] or 0)
+        return {'income': income, 'expenses': expenses, 'balance': income - expenses}
+    return await datacache.acached(user, 'period_totals', compute, (start, end), version)
+
+
+def _recent(user):
+    return Transaction.objects.filter(user=user).select_related('category').order_by('-date')[:10]
+
+
+def recent_transactions(user, version=None):
+    """Последние 10 транзакций для главной."""
+    return datacache.cached(user, 'recent', lambda: list(_recent(user)), version=version)
+
+
+async def arecent_transactions(user, version=None):
+    async def compute():
+        return [tx async for tx in _recent(user)]
+    return await datacache.acached(user, 'recent', compute, version=version)
+
+
+def _goals(user):
+    return Goal.objects.with_progress().filter(user=user).order_by('deadline')[:5]
+
+
+def goals_preview(user, version=None):
+    """Ближайшие по сроку 5 целей для главной."""
+    return datacache.cached(user, 'goals', lambda: list(_goals(user)), version=version)
+
+
+async def agoals_preview(user, version=None):
+    async def compute():
+        return [goal async for goal in _goals(user)]
+    return await datacache.acached(user, 'goals', compute, version=version)
+
+
+BUDGET_WARN_PERCENT = 80  # с какой доли лимита бюджет подсвечивается как почти исчерпанный
+
+
+def _budget_rows(user, month):
+    # одна строка MonthlyRollup на категорию за месяц: LEFT JOIN по уникальному индексу
+    # (user, month, type, category), без SUM по транзакциям каждой категории
+    return (
+        Category.objects
+        .filter(user=user, type='expense', monthly_limit__isnull=False)
+        .annotate(spent_row=FilteredRelation('monthly_rollups', condition=Q(
+            monthly_rollups__user=user, monthly_rollups__month=month, monthly_rollups__type='expense',
+        )))
+        .values('id', 'name', 'monthly_limit', spent=F('spent_row__total'))
+        .order_by('name')
+    )
+
+
+def _budget_panel(rows):
+    panel = []
+    for row in rows:
+        limit, spent = row['monthly_limit'], cents(row['spent'])
+        percent = round(spent / limit * 100, 1) if limit else 100
+        panel.append({
+            'id': row['id'],
+            'name': row['name'],
+            'limit': limit,
+            'spent': spent,
+            'left': max(limit - spent, 0),
+            'over': max(spent - limit, 0),
+            'percent': percent,
+            'bar': min(percent, 100),
+            'level': 'danger' if spent > limit else 'warning' if percent >= BUDGET_WARN_PERCENT else 'success',
+        })
+    return panel
+
+
+def budgets(user, version=None):
+    """Бюджеты категорий расходов за текущий месяц: лимит, потрачено, процент и уровень тревоги."""
+    month = timezone.localdate().replace(day=1)
+    return datacache.cached(user, 'budgets', lambda: _budget_panel(_budget_rows(user, month)), (month,), version)
+
+
+async def abudgets(user, version=None):
+    month = timezone.localdate().replace(day=1)
+
+    async def compute():
+        return _budget_panel([row async for row in _budget_rows(user, month)])
+    return await datacache.acached(user, 'budgets', compute, (month,), version)
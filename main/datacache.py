@@ -0,0 +1,66 @@
+"""Кэш посчитанных данных пользователя (итоги, графики, разбивки по категориям).
+
+Ключ включает версию данных пользователя (Ledger.version), которую увеличивает
+любое изменение транзакций, целей или категорий. Поэтому инвалидация не удаляет
+ключи по одному: после записи все старые значения пользователя просто перестают
+запрашиваться и вытесняются бэкендом (LocMemCache вытесняет давно не читанные).
+Версия хранится в БД, так что кэш согласован между воркерами даже с locmem.
+"""
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+from . import ledger
+
+CACHE_ALIAS = 'default'
+TIMEOUT = 60 * 60
+
+_MISSING = object()
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_key(user_id, version, name, params):
+    return ':'.join(['data', str(user_id), f'v{version}', name, *map(str, params)])
+
+
+def cached(user, name, compute, params=(), version=None):
+    """Значение compute() из кэша по (пользователь, версия данных, name, params)."""
+    if version is None:
+        version = ledger.version(user)
+    cache = caches[CACHE_ALIAS]
+    key = cache_key(user.id, version, name, params)
+    value = cache.get(key, _MISSING)
+    _count(value)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, TIMEOUT)
+    return value
+
+
+async def acached(user, name, compute, params=(), version=None):
+    """Асинхронный cached(): compute — корутинная функция, кэш читается через aget/aset."""
+    if version is None:
+        version = await sync_to_async(ledger.version)(user)
+    cache = caches[CACHE_ALIAS]
+    key = cache_key(user.id, version, name, params)
+    value = await cache.aget(key, _MISSING)
+    _count(value)
+    if value is _MISSING:
+        value = await compute()
+        await cache.aset(key, value, TIMEOUT)
+    return value
+
+
+def _count(value):
+    with _lock:
+        _stats['hits' if value is not _MISSING else 'misses'] += 1
+
+
+def stats():
+    """Счётчики попаданий и промахов текущего процесса."""
+    with _lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 3) if total else 0}
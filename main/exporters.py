@@ -0,0 +1,49 @@
+"""Потоковая выгрузка транзакций в CSV и NDJSON.
+
+Генераторы читают queryset через .iterator() порциями по CHUNK_SIZE и отдают по
+одной готовой строке ответа, поэтому память не зависит от числа транзакций,
+а первые байты уходят клиенту сразу.
+"""
+import csv
+import json
+
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+
+# те же колонки, что понимает импорт (main/importers.py)
+FIELDS = ['date', 'amount', 'type', 'category', 'description']
+
+
+def _records(queryset):
+    rows = queryset.values_list('date', 'amount', 'type', 'category__name', 'description')
+    for date, amount, type_, category, description in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield timezone.localtime(date).strftime('%Y-%m-%d %H:%M:%S'), amount, type_, category or '', description
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(queryset):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(FIELDS)  # BOM, чтобы Excel открыл кириллицу
+    for record in _records(queryset):
+        yield writer.writerow(record)
+
+
+def ndjson_lines(queryset):
+    for record in _records(queryset):
+        row = dict(zip(FIELDS, record))
+        row['amount'] = str(row['amount'])
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+# формат -> (генератор строк, content type, расширение файла)
+FORMATS = {
+    'csv': (csv_lines, 'text/csv; charset=utf-8', 'csv'),
+    'ndjson': (ndjson_lines, 'application/x-ndjson; charset=utf-8', 'ndjson'),
+}
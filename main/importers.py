@@ -0,0 +1,217 @@
+"""Потоковый импорт банковских выписок (CSV / OFX).
+
+Парсеры — генераторы: файл читается построчно и ни на каком этапе не держится в памяти
+целиком. Строки пишутся через bulk_create пачками фиксированного размера, каждая пачка —
+в своей транзакции БД вместе с обновлением дневных итогов и баланса.
+"""
+import csv
+import re
+from collections import Counter, namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Category, Transaction
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 100  # сколько ошибок разбора хранить для отчёта
+
+ImportRow = namedtuple('ImportRow', 'line date amount type category description')
+
+# допустимые названия колонок CSV -> поле ImportRow
+CSV_COLUMNS = {
+    'date': 'date', 'дата': 'date',
+    'amount': 'amount', 'сумма': 'amount',
+    'type': 'type', 'тип': 'type',
+    'category': 'category', 'категория': 'category',
+    'description': 'description', 'комментарий': 'description', 'описание': 'description',
+}
+TYPE_ALIASES = {
+    'income': 'income', 'доход': 'income',
+    'expense': 'expense', 'расход': 'expense',
+}
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d', '%d.%m.%Y %H:%M', '%d.%m.%Y']
+
+
+class RowError(ValueError):
+    """Строку выписки не удалось разобрать."""
+
+
+def parse_amount(value):
+    try:
+        return Decimal(value.replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        raise RowError(f'некорректная сумма «{value}»')
+
+
+def parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return timezone.make_aware(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise RowError(f'некорректная дата «{value}»')
+
+
+def make_row(line, date, amount, type_='', category='', description=''):
+    """Собирает ImportRow: знак суммы задаёт тип, если тип не указан явно."""
+    type_ = TYPE_ALIASES.get((type_ or '').strip().lower(), '')
+    if not type_:
+        type_ = 'expense' if amount < 0 else 'income'
+    amount = abs(amount)
+    if not amount:
+        raise RowError('нулевая сумма')
+    return ImportRow(line, date, amount, type_, (category or '').strip(), (description or '').strip())
+
+
+def parse_csv(lines):
+    """Генератор (ImportRow | RowError) по строкам CSV с заголовком.
+
+    Разделитель (запятая или точка с запятой) определяется по строке заголовка.
+    """
+    lines = iter(lines)
+    header = next(lines, '')
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    columns = [CSV_COLUMNS.get(name.strip().lower()) for name in next(csv.reader([header], delimiter=delimiter))]
+    if 'date' not in columns or 'amount' not in columns:
+        raise RowError('в заголовке CSV нужны колонки date и amount')
+
+    for line, record in enumerate(csv.reader(lines, delimiter=delimiter), start=2):
+        if not any(record):
+            continue
+        fields = {column: value for column, value in zip(columns, record) if column}
+        try:
+            yield make_row(
+                line,
+                parse_date(fields.get('date', '')),
+                parse_amount(fields.get('amount', '')),
+                fields.get('type'),
+                fields.get('category'),
+                fields.get('description'),
+            )
+        except RowError as e:
+            yield RowError(f'строка {line}: {e}')
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def parse_ofx(lines):
+    """Генератор (ImportRow | RowError) по операциям <STMTTRN> выписки OFX (SGML и XML)."""
+    record, start = None, 0
+    for line, text in enumerate(lines, start=1):
+        for closing, tag, value in OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    record, start = {}, line
+                    continue
+                if record is not None:
+                    yield _ofx_row(start, record)
+                record = None
+            elif record is not None and not closing:
+                record[tag] = value.strip()
+
+
+def _ofx_row(line, record):
+    try:
+        posted = record.get('DTPOSTED', '')[:14]
+        date = timezone.make_aware(datetime.strptime(posted.ljust(14, '0')[:14], '%Y%m%d%H%M%S'))
+    except ValueError:
+        return RowError(f'строка {line}: некорректная дата «{record.get("DTPOSTED", "")}»')
+    try:
+        amount = parse_amount(record.get('TRNAMT', ''))
+        description = ' '.join(filter(None, [record.get('NAME'), record.get('MEMO')]))
+        return make_row(line, date, amount, description=description)
+    except RowError as e:
+        return RowError(f'строка {line}: {e}')
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx}
+
+
+def import_transactions(user, rows, batch_size=BATCH_SIZE, on_batch=None):
+    """Пишет строки выписки пользователю пачками по batch_size.
+
+    Категории ищутся по имени (без учёта регистра) в словаре, загруженном один раз,
+    и создаются при отсутствии. Строки, совпадающие с транзакциями, которые были до импорта
+    (дата, сумма, тип, комментарий), пропускаются — но только столько раз, сколько таких
+    транзакций было: две одинаковые покупки в одной выписке импортируются обе. on_batch(номер пачки, stats)
+    вызывается после каждой пачки. Возвращает stats.
+    """
+    stats = {'read': 0, 'created': 0, 'duplicates': 0, 'errors': 0, 'messages': []}
+    categories = {
+        (name.lower(), type_): pk
+        for pk, name, type_ in Category.objects.filter(user=user).values_list('id', 'name', 'type')
+    }
+    seen, written = Counter(), Counter()  # сколько раз ключ встретился в выписке и записан ею
+    rows = iter(rows)
+    batch_no = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        batch_no += 1
+        stats['read'] += len(batch)
+
+        parsed = []
+        for row in batch:
+            if isinstance(row, RowError):
+                stats['errors'] += 1
+                if len(stats['messages']) < MAX_ERRORS:
+                    stats['messages'].append(str(row))
+            else:
+                parsed.append(row)
+
+        with transaction.atomic():
+            created = _write_batch(user, parsed, categories, seen, written)
+        stats['created'] += created
+        stats['duplicates'] += len(parsed) - created
+
+        if on_batch:
+            on_batch(batch_no, stats)
+    return stats
+
+
+def _write_batch(user, rows, categories, seen, written):
+    if not rows:
+        return 0
+    # сколько транзакций с каждым ключом уже сохранено (с теми же моментами времени, что и в пачке);
+    # записанные этим же импортом в прошлых пачках дубликатами не считаются
+    stored = Counter(
+        Transaction.objects
+        .filter(user=user, date__in={row.date for row in rows})
+        .values_list('date', 'amount', 'type', 'description')
+    )
+    objects = []
+    for row in rows:
+        key = (row.date, row.amount, row.type, row.description)
+        seen[key] += 1
+        if seen[key] <= stored[key] - written[key]:
+            continue
+        written[key] += 1
+        objects.append(Transaction(
+            user=user,
+            category_id=_category_id(user, row, categories),
+            amount=row.amount,
+            description=row.description,
+            date=row.date,
+            type=row.type,
+        ))
+    Transaction.objects.bulk_create(objects)
+    rollups.apply_many(objects)
+    return len(objects)
+
+
+def _category_id(user, row, categories):
+    if not row.category:
+        return None
+    key = (row.category.lower(), row.type)
+    if key not in categories:
+        categories[key] = Category.objects.create(user=user, name=row.category[:50], type=row.type).pk
+    return categories[key]
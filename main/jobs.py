@@ -0,0 +1,179 @@
+"""Фоновые задачи: импорт выписок, выгрузка и пересборка итогов вне запроса gunicorn.
+
+Представление ставит задачу (enqueue) — строку Job со статусом queued — и сразу отвечает.
+manage.py run_jobs забирает задачи одним UPDATE ... WHERE status='queued' (два воркера
+не получат одну задачу) и выполняет их в ProcessPoolExecutor, по процессу на ядро.
+Ход выполнения (progress) и результат пишутся в ту же строку, страница задачи опрашивает
+их через views.job_status. Брокер не нужен: очередь — это таблица main_job.
+"""
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from . import exporters, importers, rollups, search, usertz
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(minutes=10)  # running-задача без обновлений дольше — воркер упал
+KEEP = timedelta(days=7)  # сколько хранить завершённые задачи и их файлы
+
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """Ошибка, текст которой показывается пользователю на странице задачи."""
+
+
+def handler(kind):
+    """Регистрирует функцию handler(job) -> result (JSON) для задач вида kind."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, user=None, **params):
+    """Ставит задачу в очередь. При JOBS_INLINE (разработка без воркера) выполняет её сразу."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный вид задачи: {kind}')
+    job = Job.objects.create(kind=kind, user=user, params=params)
+    if getattr(settings, 'JOBS_INLINE', False) and claim('inline', job.pk):
+        execute(job.pk, close=False)
+        job.refresh_from_db()
+    return job
+
+
+def claim(worker, job_id=None):
+    """Забирает самую старую queued-задачу (или job_id), возвращает её id или None.
+
+    Статус меняется условным UPDATE: если задачу успел забрать другой воркер,
+    обновится 0 строк, и берётся следующая.
+    """
+    queued = Job.objects.filter(status='queued')
+    while True:
+        candidate = job_id or queued.order_by('id').values_list('id', flat=True).first()
+        if candidate is None:
+            return None
+        now = timezone.now()
+        if queued.filter(id=candidate).update(status='running', worker=worker, started_at=now, updated_at=now):
+            return candidate
+        if job_id:
+            return None
+
+
+def requeue_stale():
+    """Возвращает в очередь running-задачи, которые не обновлялись дольше STALE_AFTER."""
+    return Job.objects.filter(status='running', updated_at__lt=timezone.now() - STALE_AFTER).update(
+        status='queued', worker='', progress=0,
+    )
+
+
+def purge():
+    """Удаляет завершённые задачи старше KEEP вместе с файлами выгрузок, возвращает их число."""
+    old = Job.objects.filter(finished_at__lt=timezone.now() - KEEP)
+    for result in old.filter(kind='export', status='done').values_list('result', flat=True):
+        remove_file(result['file'])
+    deleted, _ = old.delete()
+    return deleted
+
+
+def set_progress(job, done, total):
+    progress = min(int(done * 100 / total), 99) if total else 0
+    Job.objects.filter(pk=job.pk).update(progress=progress, updated_at=timezone.now())
+
+
+def execute(job_id, close=True):
+    """Выполняет забранную задачу и записывает результат или ошибку. Вызывается в процессе воркера."""
+    job = Job.objects.select_related('user').get(pk=job_id)
+    try:
+        # даты разбираются и выводятся в зоне владельца задачи, как в его запросах
+        with timezone.override(usertz.stored_zone(job.user_id) if job.user_id else None):
+            result = HANDLERS[job.kind](job)
+    except JobError as e:
+        _finish(job, 'failed', error=str(e))
+    except Exception:
+        logger.exception('Задача %s #%s упала', job.kind, job.pk)
+        _finish(job, 'failed', error='Внутренняя ошибка, задача не выполнена.')
+    else:
+        _finish(job, 'done', result=result, progress=100)
+    finally:
+        if close:
+            connections.close_all()
+    return job_id
+
+
+def _finish(job, status, **fields):
+    now = timezone.now()
+    Job.objects.filter(pk=job.pk).update(status=status, finished_at=now, updated_at=now, **fields)
+
+
+def path(name):
+    """Путь к файлу задачи (загруженная выписка, готовая выгрузка) в JOBS_DIR."""
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    return os.path.join(settings.JOBS_DIR, name)
+
+
+def remove_file(name):
+    try:
+        os.remove(path(name))
+    except FileNotFoundError:
+        pass
+
+
+@handler('import')
+def _import(job):
+    """params: file — имя загруженной выписки в JOBS_DIR, format — csv или ofx."""
+    name = job.params['file']
+    total = os.path.getsize(path(name))
+    try:
+        with open(path(name), 'rb') as raw:
+            lines = io.TextIOWrapper(raw, encoding='utf-8-sig', errors='replace', newline='')
+            return importers.import_transactions(
+                job.user, importers.PARSERS[job.params['format']](lines),
+                on_batch=lambda batch_no, stats: set_progress(job, raw.tell(), total),
+            )
+    except importers.RowError as e:
+        raise JobError(f'Ошибка в файле: {e}')
+    finally:
+        remove_file(name)
+
+
+@handler('export')
+def _export(job):
+    """params: format, sort, category_id, query — те же, что у выгрузки из списка транзакций."""
+    params = job.params
+    lines, _, extension = exporters.FORMATS[params['format']]
+    sort = params['sort']
+    transactions = search.filtered(job.user, params.get('category_id'), params.get('query')).order_by(
+        sort, ('-' if sort.startswith('-') else '') + 'id'
+    )
+
+    total = transactions.count()
+    name = f'export-{job.pk}.{extension}'
+    rows = 0
+    with open(path(name), 'w', encoding='utf-8', newline='') as f:
+        for line in lines(transactions):
+            f.write(line)
+            rows += 1
+            if rows % exporters.CHUNK_SIZE == 0:
+                set_progress(job, rows, total)
+    return {'file': name, 'rows': total}
+
+
+@handler('relocalize')
+def _relocalize(job):
+    """После смены часового пояса в профиле: даты транзакций и итоги по новой зоне."""
+    usertz.relocalize(job.user)
+    return {'mismatches': len(rollups.verify(job.user))}
+
+
+@handler('rebuild_rollups')
+def _rebuild_rollups(job):
+    rollups.rebuild(job.user)
+    return {'mismatches': len(rollups.verify(job.user))}
@@ -0,0 +1,134 @@
+"""Хранимый баланс пользователя (Ledger) и контрольные точки баланса (LedgerCheckpoint).
+
+Ledger сдвигается на дельту каждой изменённой транзакции; контрольные точки с датой
+не раньше дня транзакции сдвигаются тем же UPDATE-ом, поэтому баланс на любую прошлую
+дату = ближайшая точка + дневные итоги после неё.
+"""
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import DailyRollup, Ledger, LedgerCheckpoint, Transaction
+
+
+def cents(value):
+    """Сумма, округлённая до копеек: SUM в SQLite считает десятичные поля во float."""
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+def signed(type_, amount):
+    """Влияние суммы на баланс: доход прибавляется, расход вычитается."""
+    return amount if type_ == 'income' else -amount
+
+
+def shift(user_id, day, type_, amount):
+    """Сдвигает итоги на amount (со знаком: отрицательный при удалении) транзакции типа type_ за day."""
+    delta = signed(type_, amount)
+    field = 'income' if type_ == 'income' else 'expenses'
+    changes = {
+        field: F(field) + amount,
+        'balance': F('balance') + delta,
+        'version': F('version') + 1,
+        'updated_at': timezone.now(),
+    }
+    if not Ledger.objects.filter(user_id=user_id).update(**changes):
+        # Записи ещё нет: изменение уже могло попасть в Transaction (создание) или ещё нет
+        # (удаление), поэтому по истории её здесь не посчитать — начинаем с нуля.
+        # get() создаёт запись по всей истории при первом чтении, check_balances --fix чинит расхождения.
+        _create(user_id, income=0, expenses=0, balance=0)
+        Ledger.objects.filter(user_id=user_id).update(**changes)
+    LedgerCheckpoint.objects.filter(user_id=user_id, day__gte=day).update(balance=F('balance') + delta)
+
+
+def shift_many(user_id, amounts):
+    """То же, что shift, для пачки: amounts — {(day, type): сумма}. Один UPDATE Ledger
+    и по одному UPDATE на каждую затронутую контрольную точку."""
+    income = sum(amount for (_, type_), amount in amounts.items() if type_ == 'income')
+    expenses = sum(amount for (_, type_), amount in amounts.items() if type_ != 'income')
+    changes = {
+        'income': F('income') + income,
+        'expenses': F('expenses') + expenses,
+        'balance': F('balance') + income - expenses,
+        'version': F('version') + 1,
+        'updated_at': timezone.now(),
+    }
+    if not Ledger.objects.filter(user_id=user_id).update(**changes):
+        _create(user_id, income=0, expenses=0, balance=0)
+        Ledger.objects.filter(user_id=user_id).update(**changes)
+
+    first_day = min(day for day, _ in amounts)
+    for point in LedgerCheckpoint.objects.filter(user_id=user_id, day__gte=first_day):
+        delta = sum(signed(type_, amount) for (day, type_), amount in amounts.items() if day <= point.day)
+        if delta:
+            LedgerCheckpoint.objects.filter(pk=point.pk).update(balance=F('balance') + delta)
+
+
+def _create(user_id, **totals):
+    try:
+        with transaction.atomic():
+            return Ledger.objects.create(user_id=user_id, **(totals or recompute(user_id)))
+    except IntegrityError:
+        # параллельный запрос уже создал запись
+        return Ledger.objects.get(user_id=user_id)
+
+
+def bump(user_id):
+    """Увеличивает версию данных пользователя, не меняя сумм (цели, категории, пересборка итогов)."""
+    if not Ledger.objects.filter(user_id=user_id).update(version=F('version') + 1, updated_at=timezone.now()):
+        _create(user_id)
+
+
+def version(user):
+    """Текущая версия данных пользователя."""
+    value = Ledger.objects.filter(user=user).values_list('version', flat=True).first()
+    return value if value is not None else get(user).version
+
+
+def get(user):
+    """Запись Ledger пользователя (создаётся при первом обращении)."""
+    return Ledger.objects.filter(user=user).first() or _create(user.id)
+
+
+async def aget(user):
+    """Асинхронный get()."""
+    return await Ledger.objects.filter(user=user).afirst() or await sync_to_async(_create)(user.id)
+
+
+def recompute(user_id, day=None):
+    """Доходы, расходы и баланс по таблице Transaction — полный пересчёт (до конца day, если задан)."""
+    transactions = Transaction.objects.filter(user_id=user_id)
+    if day is not None:
+        transactions = transactions.filter(local_date__lte=day)
+    totals = transactions.aggregate(
+        income=Sum('amount', filter=Q(type='income')),
+        expenses=Sum('amount', filter=Q(type='expense')),
+    )
+    income, expenses = cents(totals['income']), cents(totals['expenses'])
+    return {'income': income, 'expenses': expenses, 'balance': income - expenses}
+
+
+def balance_on(user, day):
+    """Баланс на конец дня day: ближайшая контрольная точка + дневные итоги после неё."""
+    checkpoint = LedgerCheckpoint.objects.filter(user=user, day__lte=day).order_by('-day').first()
+    rows = DailyRollup.objects.filter(user=user, day__lte=day)
+    base = 0
+    if checkpoint:
+        rows = rows.filter(day__gt=checkpoint.day)
+        base = checkpoint.balance
+    totals = rows.aggregate(
+        income=Sum('total', filter=Q(type='income')),
+        expenses=Sum('total', filter=Q(type='expense')),
+    )
+    return base + (totals['income'] or 0) - (totals['expenses'] or 0)
+
+
+def checkpoint(user, day):
+    """Сохраняет (или обновляет) контрольную точку баланса на конец дня day."""
+    with transaction.atomic():
+        point, _ = LedgerCheckpoint.objects.update_or_create(
+            user=user, day=day, defaults={'balance': balance_on(user, day)},
+        )
+    return point
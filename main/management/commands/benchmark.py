@@ -0,0 +1,100 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from main import benchmark
+from main.models import Category, Transaction
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время и число SQL-запросов основных страниц через тестовый клиент '
+            'на данных из seed_data и сравнивает с сохранённым базовым запуском.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench-1@example.com', help='Пользователь из seed_data.')
+        parser.add_argument('--runs', type=int, default=30, help='Повторов на каждую страницу.')
+        parser.add_argument('--warm', action='store_true', help='Не очищать кэш данных перед каждым запросом.')
+        parser.add_argument('--output', default='bench_results.json', help='Куда записать результаты (JSON).')
+        parser.add_argument('--baseline', help='JSON предыдущего запуска для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление p95 (доля).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['user']} не найден — сначала запустите seed_data")
+        client = Client()
+        client.force_login(user)
+        self.options = options
+
+        results = {}
+        for name, url in self.read_pages(user):
+            results[name] = self.measure(lambda: client.get(url))
+        results.update(self.measure_writes(client, user))
+
+        baseline = benchmark.read_results(options['baseline']) if options['baseline'] else None
+        self.stdout.write(benchmark.format_table(results, baseline))
+        benchmark.write_results(options['output'], results, runs=options['runs'], warm=options['warm'])
+        self.stdout.write(f"Результаты записаны в {options['output']}")
+
+        if baseline:
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            for line in regressions:
+                self.stderr.write(f'регрессия: {line}')
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def read_pages(self, user):
+        yield 'index', reverse('main:index')
+        for period in (7, 30, 365):
+            yield f'reports {period}d', f"{reverse('main:reports')}?period={period}"
+            for api in ('series', 'categories', 'summary'):
+                yield f'api {api} {period}d', f"{reverse(f'main:chart_{api}')}?period={period}"
+        category = Category.objects.filter(user=user).first()
+        for sort in ('-date', 'date', '-amount', 'amount', '-type', 'type'):
+            yield f'transactions sort={sort}', f"{reverse('main:transactions_list')}?sort={sort}"
+            if category:
+                yield (f'transactions sort={sort} category',
+                       f"{reverse('main:transactions_list')}?sort={sort}&category={category.id}")
+        yield 'goals', reverse('main:goals_list')
+        yield 'categories', reverse('main:categories_list')
+
+    def measure(self, request):
+        times, queries = [], []
+        for _ in range(self.options['runs']):
+            if not self.options['warm']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request()
+                times.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'{response.status_code} от {response.request["PATH_INFO"]}')
+            queries.append(len(captured.captured_queries))
+        return benchmark.summarize(times, queries)
+
+    def measure_writes(self, client, user):
+        """Добавление, изменение и удаление транзакции — набор данных после замера не меняется."""
+        now = timezone.localtime()
+        form = {'amount': '123.45', 'description': 'benchmark',
+                'date': now.strftime('%Y-%m-%d'), 'time': now.strftime('%H:%M')}
+        results = {'transaction_add': self.measure(
+            lambda: client.post(reverse('main:transaction_add', args=['expense']), form)
+        )}
+        created = list(Transaction.objects.filter(user=user, description='benchmark').values_list('id', flat=True))
+        edits = iter(created)
+        results['transaction_edit'] = self.measure(
+            lambda: client.post(reverse('main:transaction_edit', args=[next(edits)]), {**form, 'amount': '99'})
+        )
+        deletes = iter(created)
+        results['transaction_delete'] = self.measure(
+            lambda: client.post(reverse('main:transaction_delete', args=[next(deletes)]))
+        )
+        return results
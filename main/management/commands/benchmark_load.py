@@ -0,0 +1,130 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Параллельная нагрузка на index и reports: --mode wsgi (потоки, синхронный обработчик) '
+            'или --mode asgi (корутины, ASGI-обработчик). Сравнение развёртываний:\n'
+            '  MYBUDGET_ASYNC_VIEWS=0 manage.py benchmark_load --mode wsgi\n'
+            '  MYBUDGET_ASYNC_VIEWS=1 manage.py benchmark_load --mode asgi --baseline bench_results_wsgi.json')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'],
+                            help='По умолчанию asgi при ASYNC_VIEWS, иначе wsgi.')
+        parser.add_argument('--user', default='bench-1@example.com', help='Пользователь из seed_data.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Одновременных клиентов.')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на страницу (всего).')
+        parser.add_argument('--cold', action='store_true', help='Очищать кэш данных перед каждым запросом.')
+        parser.add_argument('--output', help='JSON с результатами (по умолчанию bench_results_<mode>.json).')
+        parser.add_argument('--baseline', help='JSON другого запуска для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление p95 (доля).')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['user']} не найден — сначала запустите seed_data")
+        mode = options['mode'] or ('asgi' if settings.ASYNC_VIEWS else 'wsgi')
+        self.options = options
+
+        # одна сессия на всех клиентов, чтобы вход не попадал в замеры
+        client = Client()
+        client.force_login(user)
+        self.cookies = client.cookies
+        self.stdout.write(f"режим {mode}, представления {'async' if settings.ASYNC_VIEWS else 'sync'}, "
+                          f"клиентов {options['concurrency']}")
+
+        results = {}
+        for name, url in self.pages():
+            with CaptureQueriesContext(connection) as captured:
+                client.get(url)
+            run = self.run_asgi if mode == 'asgi' else self.run_wsgi
+            times, elapsed = run(url)
+            results[name] = {
+                **benchmark.summarize(times, [len(captured.captured_queries)]),
+                'rps': round(len(times) / elapsed, 1),
+            }
+
+        baseline = benchmark.read_results(options['baseline']) if options['baseline'] else None
+        self.stdout.write(benchmark.format_table(results, baseline))
+        for name, result in results.items():
+            line = f"{name}: {result['rps']} запросов/с"
+            if baseline and name in baseline and baseline[name].get('rps'):
+                line += f" (было {baseline[name]['rps']})"
+            self.stdout.write(line)
+        output = options['output'] or f'bench_results_{mode}.json'
+        benchmark.write_results(output, results, mode=mode, async_views=settings.ASYNC_VIEWS,
+                                concurrency=options['concurrency'], cold=options['cold'])
+        self.stdout.write(f'Результаты записаны в {output}')
+        if baseline:
+            for line in benchmark.compare(results, baseline, options['tolerance']):
+                self.stderr.write(f'регрессия: {line}')
+
+    def pages(self):
+        yield 'index', reverse('main:index')
+        for period in (30, 365):
+            yield f'reports {period}d', f"{reverse('main:reports')}?period={period}"
+
+    def chunks(self):
+        """Сколько запросов делает каждый из concurrency клиентов."""
+        count, workers = self.options['requests'], self.options['concurrency']
+        return [count // workers + (1 if n < count % workers else 0) for n in range(workers)]
+
+    def run_wsgi(self, url):
+        def worker(count):
+            client = Client()
+            client.cookies = self.cookies
+            times = []
+            try:
+                for _ in range(count):
+                    if self.options['cold']:
+                        cache.clear()
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    times.append((time.perf_counter() - start) * 1000)
+                    self.expect_ok(response, url)
+            finally:
+                connection.close()
+            return times
+
+        with ThreadPoolExecutor(self.options['concurrency']) as pool:
+            start = time.perf_counter()
+            chunks = list(pool.map(worker, self.chunks()))
+            elapsed = time.perf_counter() - start
+        return [ms for chunk in chunks for ms in chunk], elapsed
+
+    def run_asgi(self, url):
+        async def worker(count):
+            client = AsyncClient()
+            client.cookies = self.cookies
+            times = []
+            for _ in range(count):
+                if self.options['cold']:
+                    await cache.aclear()
+                start = time.perf_counter()
+                response = await client.get(url)
+                times.append((time.perf_counter() - start) * 1000)
+                self.expect_ok(response, url)
+            return times
+
+        async def run():
+            start = time.perf_counter()
+            chunks = await asyncio.gather(*(worker(count) for count in self.chunks()))
+            return [ms for chunk in chunks for ms in chunk], time.perf_counter() - start
+
+        return asyncio.run(run())
+
+    def expect_ok(self, response, url):
+        if response.status_code != 200:
+            raise CommandError(f'{response.status_code} от {url}')
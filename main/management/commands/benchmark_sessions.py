@@ -0,0 +1,158 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from main import authcache, benchmark, rollups
+from main.models import Category, Transaction
+
+SESSIONS = 'django.contrib.sessions.backends.'
+MESSAGES = 'django.contrib.messages.storage.'
+
+MODES = {
+    'db': {
+        'SESSION_ENGINE': SESSIONS + 'db',
+        'MESSAGE_STORAGE': MESSAGES + 'fallback.FallbackStorage',
+        'USER_CACHE_SECONDS': 0,
+    },
+    'cached_db': {
+        'SESSION_ENGINE': SESSIONS + 'cached_db',
+        'MESSAGE_STORAGE': MESSAGES + 'cookie.CookieStorage',
+        'USER_CACHE_SECONDS': 30,
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': SESSIONS + 'signed_cookies',
+        'MESSAGE_STORAGE': MESSAGES + 'cookie.CookieStorage',
+        'USER_CACHE_SECONDS': 30,
+    },
+}
+
+WRITE_SQL = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+DESCRIPTION = 'benchmark-sessions'
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает режимы сессий, сообщений и кэша пользователя (db — как было, cached_db, '
+            'signed_cookies): SQL на запрос к страницам main/urls.py, из них к django_session и '
+            'auth_user, записи в БД, и время записи при параллельных клиентах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench-1@example.com', help='Пользователь из seed_data.')
+        parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+        parser.add_argument('--runs', type=int, default=5, help='Повторов на каждую страницу.')
+        parser.add_argument('--concurrency', type=int, default=4, help='Клиентов в параллельной записи.')
+        parser.add_argument('--writes', type=int, default=50, help='Добавлений+удалений на клиента.')
+        parser.add_argument('--output', default='bench_results_sessions.json', help='JSON с результатами.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['user']} не найден — сначала запустите seed_data")
+        self.user, self.options = user, options
+
+        results = {}
+        self.stdout.write(f"{'режим':<16}{'SQL':>7}{'сессия':>8}{'auth':>6}{'запись':>8}"
+                          f"{'p95 записи':>12}{'locked':>8}")
+        for mode in options['modes']:
+            with override_settings(**MODES[mode]):
+                authcache.clear()
+                result = {**self.measure_requests(), **self.measure_contention()}
+            results[mode] = result
+            self.stdout.write(
+                f"{mode:<16}{result['sql']:>7}{result['session_sql']:>8}{result['auth_sql']:>6}"
+                f"{result['write_sql']:>8}{result['write_p95_ms']:>12}{result['locked']:>8}"
+            )
+        self.stdout.write('SQL, сессия, auth, запись — среднее число запросов на один HTTP-запрос')
+        benchmark.write_results(options['output'], results, runs=options['runs'],
+                                concurrency=options['concurrency'])
+        self.stdout.write(f"Результаты записаны в {options['output']}")
+
+    def pages(self):
+        yield 'get', reverse('main:index'), None
+        yield 'get', reverse('main:reports'), None
+        for api in ('series', 'categories', 'summary'):
+            yield 'get', reverse(f'main:chart_{api}'), None
+        yield 'get', reverse('main:transactions_list'), None
+        yield 'get', reverse('main:goals_list'), None
+        yield 'get', reverse('main:categories_list'), None
+        yield 'post', reverse('main:transaction_add', args=['expense']), self.form()
+
+    def form(self, description=DESCRIPTION):
+        now = timezone.localtime()
+        return {'amount': '1.00', 'description': description,
+                'date': now.strftime('%Y-%m-%d'), 'time': now.strftime('%H:%M')}
+
+    def client(self):
+        client = Client()
+        client.force_login(self.user)
+        return client
+
+    def measure_requests(self):
+        client = self.client()
+        counts = {'sql': [], 'session_sql': [], 'auth_sql': [], 'write_sql': []}
+        try:
+            for method, url, data in self.pages():
+                getattr(client, method)(url, data)  # прогрев кэшей данных, сессии и пользователя
+                for _ in range(self.options['runs']):
+                    with CaptureQueriesContext(connection) as captured:
+                        response = getattr(client, method)(url, data)
+                    if response.status_code >= 400:
+                        raise CommandError(f'{response.status_code} от {url}')
+                    sql = [q['sql'] for q in captured.captured_queries]
+                    counts['sql'].append(len(sql))
+                    counts['session_sql'].append(sum('django_session' in s for s in sql))
+                    counts['auth_sql'].append(sum('"auth_user"' in s for s in sql))
+                    counts['write_sql'].append(sum(s.lstrip().upper().startswith(WRITE_SQL) for s in sql))
+        finally:
+            self.cleanup()
+        return {name: round(sum(values) / len(values), 2) for name, values in counts.items()}
+
+    def measure_contention(self):
+        """Параллельные клиенты добавляют и удаляют транзакции; время ответа и ошибки блокировки."""
+        category = Category.objects.filter(user=self.user, type='expense').first()
+
+        def worker(number):
+            # у каждого клиента своё описание, чтобы удалять только свои транзакции
+            form = {**self.form(f'{DESCRIPTION}-{number}'), 'category': category.id if category else ''}
+            client, times, locked = self.client(), [], 0
+            try:
+                for _ in range(self.options['writes']):
+                    start = time.perf_counter()
+                    try:
+                        client.post(reverse('main:transaction_add', args=['expense']), form)
+                        tx = Transaction.objects.filter(
+                            user=self.user, description=form['description']).order_by('-id').first()
+                        if tx is not None:
+                            client.post(reverse('main:transaction_delete', args=[tx.id]))
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        locked += 1
+                        continue
+                    times.append((time.perf_counter() - start) * 1000)
+            finally:
+                connection.close()
+            return times, locked
+
+        try:
+            with ThreadPoolExecutor(self.options['concurrency']) as pool:
+                runs = list(pool.map(worker, range(self.options['concurrency'])))
+        finally:
+            self.cleanup()
+        times = [ms for chunk, _ in runs for ms in chunk]
+        return {
+            'write_p95_ms': round(benchmark.percentile(times, 95), 2),
+            'locked': sum(locked for _, locked in runs),
+        }
+
+    def cleanup(self):
+        for tx in Transaction.objects.filter(user=self.user, description__startswith=DESCRIPTION):
+            with transaction.atomic():
+                rollups.apply(tx, -1)
+                tx.delete()
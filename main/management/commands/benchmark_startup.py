@@ -0,0 +1,134 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main import benchmark
+
+# Выполняется в отдельном интерпретаторе: замеры импорта имеют смысл только в чистом процессе.
+# workers=0 — холодный воркер без preload_app: импорт, URLconf и первый ответ в одном процессе.
+# workers>0 — мастер с preload_app: импорт один раз, затем fork воркеров, каждый отвечает на
+# первый запрос. Время — time.perf_counter (CLOCK_MONOTONIC, общий для процессов).
+CHILD = r'''
+import json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+
+def respond(application, path):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    status = []
+    body = application(environ, lambda value, headers, exc_info=None: status.append(value))
+    try:
+        b''.join(body)
+    finally:
+        body.close()
+    return status[0]
+
+
+path, workers = sys.argv[1], int(sys.argv[2])
+started = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+imported = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+routed = time.perf_counter()
+result = {'import_ms': (imported - started) * 1000, 'urls_ms': (routed - imported) * 1000}
+
+if not workers:
+    result['status'] = respond(application, path)
+    result['first_response_ms'] = (time.perf_counter() - routed) * 1000
+    result['done'] = time.perf_counter()
+else:
+    from django.db import connections
+    connections.close_all()
+    result['workers'] = []
+    for _ in range(workers):
+        forked = time.perf_counter()
+        read, write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read)
+            status = respond(application, path)
+            os.write(write, json.dumps({'ttfr_ms': (time.perf_counter() - forked) * 1000, 'status': status}).encode())
+            os._exit(0)
+        os.close(write)
+        with os.fdopen(read) as f:
+            result['workers'].append(json.loads(f.read()))
+        os.waitpid(pid, 0)
+
+result['modules'] = sorted(name for name in ('PIL', 'captcha.views', 'numpy') if name in sys.modules)
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Время старта воркера: импорт Django и приложения, загрузка URLconf и время до первого '
+            'ответа (TTFR) — для холодного воркера (без preload_app: каждый воркер импортирует всё сам) '
+            'и для воркеров, созданных fork-ом мастера с preload_app, как в gunicorn.conf.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/login/', help='URL первого запроса.')
+        parser.add_argument('--workers', type=int, default=4, help='Воркеров на один запуск.')
+        parser.add_argument('--runs', type=int, default=3, help='Повторов каждого режима.')
+        parser.add_argument('--output', default='bench_results_startup.json', help='JSON с результатами.')
+
+    def handle(self, *args, **options):
+        path, workers = options['path'], options['workers']
+        cold = {'import_ms': [], 'urls_ms': [], 'first_response_ms': [], 'ttfr_ms': []}
+        preload = {'import_ms': [], 'urls_ms': [], 'ttfr_ms': []}
+        modules = {}
+
+        for _ in range(options['runs']):
+            for _ in range(workers):
+                spawned = time.perf_counter()
+                result = self.child(path, 0)
+                for name in ('import_ms', 'urls_ms', 'first_response_ms'):
+                    cold[name].append(result[name])
+                cold['ttfr_ms'].append((result['done'] - spawned) * 1000)
+                modules['cold'] = result['modules']
+
+            result = self.child(path, workers)
+            preload['import_ms'].append(result['import_ms'])
+            preload['urls_ms'].append(result['urls_ms'])
+            preload['ttfr_ms'] += [worker['ttfr_ms'] for worker in result['workers']]
+            modules['preload'] = result['modules']
+
+        results = {}
+        self.stdout.write(f"{'режим':<10}{'импорт':>9}{'URLconf':>9}{'TTFR p50':>10}{'TTFR p95':>10}  модули")
+        for mode, times in (('cold', cold), ('preload', preload)):
+            results[mode] = {name: self.summary(values) for name, values in times.items()}
+            results[mode]['modules'] = modules[mode]
+            self.stdout.write(
+                f"{mode:<10}{results[mode]['import_ms']['p50']:>9}{results[mode]['urls_ms']['p50']:>9}"
+                f"{results[mode]['ttfr_ms']['p50']:>10}{results[mode]['ttfr_ms']['p95']:>10}  "
+                f"{', '.join(modules[mode]) or '—'}"
+            )
+        self.stdout.write('мс; TTFR — от запуска процесса (cold) или fork-а (preload) до первого ответа на '
+                          f'{path}; модули — тяжёлые зависимости, загруженные к первому ответу')
+        benchmark.write_results(options['output'], results, url=path, workers=workers, runs=options['runs'])
+        self.stdout.write(f"Результаты записаны в {options['output']}")
+
+    def child(self, path, workers):
+        process = subprocess.run(
+            [sys.executable, '-c', CHILD, path, str(workers)],
+            cwd=settings.BASE_DIR, env=os.environ.copy(), capture_output=True, text=True,
+        )
+        if process.returncode:
+            raise CommandError(f'Процесс замера завершился с ошибкой:\n{process.stderr}')
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        statuses = [result.get('status')] + [worker['status'] for worker in result.get('workers', [])]
+        if any(status and not status.startswith('200') for status in statuses):
+            raise CommandError(f'{path} ответил {statuses}')
+        return result
+
+    def summary(self, values):
+        return {
+            'p50': round(benchmark.percentile(values, 50), 1),
+            'p95': round(benchmark.percentile(values, 95), 1),
+        }
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.utils import timezone
+
+from main import ledger
+from main.models import Ledger, LedgerCheckpoint
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённые балансы (Ledger и контрольные точки) с полным пересчётом по транзакциям.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Только для пользователя с этим логином.')
+        parser.add_argument('--fix', action='store_true', help='Перезаписать расходящиеся значения пересчитанными.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        broken = 0
+        for user in users.iterator():
+            expected = ledger.recompute(user.id)
+            stored = ledger.get(user)
+            ok = all(getattr(stored, field) == value for field, value in expected.items())
+            if not ok:
+                self.stderr.write(f'{user.username}: баланс {stored.balance}, по транзакциям {expected["balance"]}')
+                if options['fix']:
+                    Ledger.objects.filter(pk=stored.pk).update(
+                        version=F('version') + 1, updated_at=timezone.now(), **expected,
+                    )
+
+            for point in LedgerCheckpoint.objects.filter(user=user).order_by('day'):
+                balance = ledger.recompute(user.id, point.day)['balance']
+                if point.balance != balance:
+                    ok = False
+                    self.stderr.write(f'{user.username}: точка на {point.day} — {point.balance}, по транзакциям {balance}')
+                    if options['fix']:
+                        LedgerCheckpoint.objects.filter(pk=point.pk).update(balance=balance)
+
+            if not ok:
+                broken += 1
+
+        if broken and not options['fix']:
+            raise CommandError(f'Балансы не сходятся у пользователей: {broken}')
+        if broken:
+            self.stdout.write(self.style.WARNING(f'Исправлены балансы пользователей: {broken}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Балансы сходятся с транзакциями.'))
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main import ledger, usertz
+
+
+class Command(BaseCommand):
+    help = ('Сохраняет контрольные точки баланса всех пользователей на конец дня (по умолчанию — вчера '
+            'в зоне каждого пользователя). Запускать по расписанию.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--day', type=date.fromisoformat, help='Дата точки в формате ГГГГ-ММ-ДД.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        count, days = 0, set()
+        for user in User.objects.filter(ledger__isnull=False).iterator():
+            # «вчера» — по календарю пользователя: точка совпадает с границей его local_date
+            day = options['day'] or usertz.local_date(user.id, now) - timedelta(days=1)
+            ledger.checkpoint(user, day)
+            count += 1
+            days.add(day)
+        self.stdout.write(self.style.SUCCESS(
+            f"Контрольных точек на {', '.join(map(str, sorted(days))) or '—'}: {count}"
+        ))
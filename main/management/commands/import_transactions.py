@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main import importers
+
+
+class Command(BaseCommand):
+    help = 'Импортирует банковскую выписку (CSV или OFX) в транзакции пользователя.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Логин пользователя.')
+        parser.add_argument('path', help='Путь к файлу выписки.')
+        parser.add_argument('--format', choices=sorted(importers.PARSERS), help='Формат файла (по умолчанию — по расширению).')
+        parser.add_argument('--encoding', default='utf-8-sig', help='Кодировка файла, например cp1251.')
+        parser.add_argument('--batch-size', type=int, default=importers.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+        fmt = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        if fmt not in importers.PARSERS:
+            raise CommandError(f'Неизвестный формат «{fmt}», укажите --format')
+
+        def report(batch_no, stats):
+            self.stdout.write(
+                f"пачка {batch_no}: прочитано {stats['read']}, добавлено {stats['created']}, "
+                f"дублей {stats['duplicates']}, ошибок {stats['errors']}"
+            )
+
+        with open(options['path'], encoding=options['encoding'], newline='') as f:
+            try:
+                stats = importers.import_transactions(
+                    user, importers.PARSERS[fmt](f), options['batch_size'], on_batch=report,
+                )
+            except importers.RowError as e:
+                raise CommandError(str(e))
+
+        for message in stats['messages']:
+            self.stderr.write(message)
+        self.stdout.write(self.style.SUCCESS(f"Импорт завершён: добавлено {stats['created']} транзакций."))
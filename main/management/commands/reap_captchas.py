@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from main import captchapool
+
+
+class Command(BaseCommand):
+    help = ('Удаляет просроченные капчи одним запросом. Веб-процессы делают это сами раз в минуту, '
+            'команда — для cron, если сайт подолгу простаивает.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Удалено просроченных капч: {captchapool.reap()}')
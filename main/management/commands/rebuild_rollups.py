@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main import jobs, rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневные итоги (DailyRollup) из таблицы транзакций и проверяет их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Только для пользователя с этим логином.')
+        parser.add_argument('--check', action='store_true', help='Только проверить, ничего не пересобирая.')
+        parser.add_argument('--background', action='store_true',
+                            help='Поставить пересборку каждого пользователя в очередь run_jobs и выйти.')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        if options['background']:
+            queued = [jobs.enqueue('rebuild_rollups', user).id for user in users.iterator()]
+            self.stdout.write(self.style.SUCCESS(f'Поставлено задач: {len(queued)}'))
+            return
+
+        broken = 0
+        for user in users.iterator():
+            if not options['check']:
+                rollups.rebuild(user)
+            mismatches = rollups.verify(user)
+            if mismatches:
+                broken += 1
+                self.stderr.write(f'{user.username}: расхождений — {len(mismatches)}, первые: {mismatches[:5]}')
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'{user.username}: OK')
+
+        if broken:
+            raise CommandError(f'Итоги не сходятся у пользователей: {broken}')
+        self.stdout.write(self.style.SUCCESS('Итоги сходятся с транзакциями.'))
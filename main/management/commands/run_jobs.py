@@ -0,0 +1,60 @@
+import multiprocessing
+import os
+import signal
+import socket
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main import jobs
+
+
+class Command(BaseCommand):
+    help = ('Воркер фоновых задач (main/jobs.py): забирает задачи из таблицы main_job и выполняет '
+            'их в пуле процессов. Запускается рядом с gunicorn: python manage.py run_jobs --workers 4')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Процессов в пуле.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Секунд между проверками пустой очереди.')
+        parser.add_argument('--once', action='store_true', help='Выполнить очередь и выйти.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Возвращено в очередь зависших задач: {requeued}')
+        purged = jobs.purge()
+        if purged:
+            self.stdout.write(f'Удалено старых задач: {purged}')
+        self.stopping = False
+        previous = {signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        processed = 0
+        # процессы пула создаются fork-ом при submit: открытое соединение с SQLite
+        # в них переходить не должно, поэтому перед каждым submit оно закрывается
+        connections.close_all()
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+            running = set()
+            while True:
+                while not self.stopping and len(running) < workers:
+                    job_id = jobs.claim(name)
+                    if job_id is None:
+                        break
+                    connections.close_all()
+                    running.add(pool.submit(jobs.execute, job_id))
+                if not running and (options['once'] or self.stopping):
+                    break
+                done, running = wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.stdout.write(f'задача #{future.result()} завершена')
+                    processed += 1
+        connections.close_all()
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {processed}'))
+
+    def stop(self, signum, frame):
+        # новые задачи не берём, начатые доделываем
+        self.stopping = True
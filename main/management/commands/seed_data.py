@@ -0,0 +1,105 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main import ledger, rollups
+from main.models import Category, Goal, GoalContribution, Transaction
+
+PASSWORD = 'bench-password'
+
+EXPENSE_CATEGORIES = ['Продукты', 'Транспорт', 'Кафе', 'Коммунальные', 'Связь', 'Одежда', 'Здоровье', 'Развлечения',
+                      'Подарки', 'Образование', 'Дом', 'Спорт']
+INCOME_CATEGORIES = ['Зарплата', 'Подработка', 'Проценты', 'Подарки']
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими пользователями, категориями, транзакциями и целями (для бенчмарков).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3)
+        parser.add_argument('--categories', type=int, default=12, help='Категорий на пользователя.')
+        parser.add_argument('--transactions', type=int, default=10000, help='Транзакций на пользователя.')
+        parser.add_argument('--goals', type=int, default=5, help='Целей на пользователя.')
+        parser.add_argument('--days', type=int, default=3 * 365, help='Глубина истории в днях.')
+        parser.add_argument('--prefix', default='bench', help='Логины вида <prefix>-<n>@example.com.')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора — одинаковые данные при каждом запуске.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        for n in range(1, options['users'] + 1):
+            username = f"{options['prefix']}-{n}@example.com"
+            # пересоздаём пользователя целиком, чтобы данные были воспроизводимыми
+            User.objects.filter(username=username).delete()
+            user = User.objects.create_user(username=username, password=PASSWORD, first_name=f'Bench {n}')
+            categories = self.create_categories(user, options['categories'])
+            count = self.create_transactions(user, categories, rng, options)
+            self.create_goals(user, rng, options['goals'])
+            self.stdout.write(f'{username}: транзакций {count}')
+        self.stdout.write(self.style.SUCCESS(f'Готово. Пароль пользователей: {PASSWORD}'))
+
+    def create_categories(self, user, count):
+        expense_count = max(count - count // 4, 1)
+        names = [(name, 'expense') for name in EXPENSE_CATEGORIES[:expense_count]]
+        names += [(name, 'income') for name in INCOME_CATEGORIES[:max(count - expense_count, 1)]]
+        return Category.objects.bulk_create(Category(user=user, name=name, type=type_) for name, type_ in names)
+
+    def create_transactions(self, user, categories, rng, options):
+        expense = [c for c in categories if c.type == 'expense']
+        income = [c for c in categories if c.type == 'income']
+        now = timezone.now().replace(second=0, microsecond=0)
+        start = now - timedelta(days=options['days'])
+        total = options['transactions']
+
+        def generate():
+            # зарплата — дважды в месяц, остальное — мелкие расходы с логнормальными суммами
+            day = start
+            while day < now:
+                if day.day in (1, 15):
+                    yield Transaction(user=user, category=income[0], type='income',
+                                      amount=Decimal(rng.randint(40, 60) * 1000),
+                                      date=day.replace(hour=10), description='Зарплата')
+                day += timedelta(days=1)
+            for i in range(total):
+                date = start + timedelta(seconds=rng.randint(0, int((now - start).total_seconds())))
+                if rng.random() < 0.08:
+                    yield Transaction(user=user, category=rng.choice(income), type='income',
+                                      amount=Decimal(round(rng.lognormvariate(8, 1), 2)).quantize(Decimal('0.01')),
+                                      date=date, description=f'Доход {i}')
+                else:
+                    yield Transaction(user=user, category=rng.choice(expense), type='expense',
+                                      amount=Decimal(round(rng.lognormvariate(6, 1.1), 2)).quantize(Decimal('0.01')),
+                                      date=date, description=f'Покупка {i}')
+
+        count, batch = 0, []
+        for tx in generate():
+            batch.append(tx)
+            if len(batch) >= options['batch_size']:
+                count += self.write(batch)
+                batch = []
+        return count + self.write(batch)
+
+    @transaction.atomic
+    def write(self, batch):
+        Transaction.objects.bulk_create(batch)
+        rollups.apply_many(batch)
+        return len(batch)
+
+    def create_goals(self, user, rng, count):
+        today = timezone.localdate()
+        goals = Goal.objects.bulk_create(
+            Goal(user=user, name=f'Цель {i + 1}', target_amount=Decimal(rng.randint(10, 500) * 1000),
+                 current_amount=Decimal(rng.randint(0, 10) * 1000),
+                 deadline=today + timedelta(days=rng.randint(30, 900)))
+            for i in range(count)
+        )
+        # накопленное — одним пополнением, чтобы сумма пополнений совпадала с current_amount
+        GoalContribution.objects.bulk_create(
+            GoalContribution(goal=goal, user=user, amount=goal.current_amount) for goal in goals if goal.current_amount
+        )
+        ledger.bump(user.id)
@@ -0,0 +1,173 @@
+import multiprocessing
+import queue
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.utils import timezone
+
+from main import benchmark, ledger, rollups
+from main.models import Category, Transaction
+from main.timeseries import income_expense_series
+
+
+# сверх --seconds на уборку за собой (удаление созданных транзакций и сессий)
+WORKER_GRACE_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочная проверка SQLite: несколько процессов одновременно читают и пишут '
+            '(транзакции, сессии) в пользователей из seed_data; считает операции и ошибки блокировки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Число процессов.')
+        parser.add_argument('--seconds', type=float, default=10, help='Длительность нагрузки.')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Доля операций записи.')
+        parser.add_argument('--prefix', default='bench', help='Пользователи <prefix>-<n>@example.com.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        user_ids = list(
+            User.objects.filter(username__startswith=f"{options['prefix']}-").values_list('id', flat=True)
+        )
+        if not user_ids:
+            raise CommandError(f"Нет пользователей {options['prefix']}-* — сначала запустите seed_data")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.stdout.write(f'journal_mode={cursor.fetchone()[0]}, процессов: {options["workers"]}')
+
+        # дочерние процессы не должны унаследовать открытое соединение родителя
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            context.Process(target=_worker, args=(n, user_ids, options, results))
+            for n in range(options['workers'])
+        ]
+        for process in workers:
+            process.start()
+        try:
+            stats = self._collect(workers, results, options['seconds'] + WORKER_GRACE_SECONDS)
+        finally:
+            for process in workers:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+        reads = [ms for s in stats for ms in s['reads']]
+        writes = [ms for s in stats for ms in s['writes']]
+        locked = sum(s['locked'] for s in stats)
+        seconds = options['seconds']
+        self.stdout.write(
+            f"чтений: {len(reads)} ({len(reads) / seconds:.0f}/с, p50 {benchmark.percentile(reads, 50):.1f} мс, "
+            f"p95 {benchmark.percentile(reads, 95):.1f} мс)\n"
+            f"записей: {len(writes)} ({len(writes) / seconds:.0f}/с, p50 {benchmark.percentile(writes, 50):.1f} мс, "
+            f"p95 {benchmark.percentile(writes, 95):.1f} мс)\n"
+            f"ошибок блокировки: {locked}"
+        )
+
+        mismatched = [user_id for user_id in user_ids if rollups.verify(User(id=user_id))]
+        if mismatched:
+            raise CommandError(f'Итоги разошлись у пользователей {mismatched} — запустите rebuild_rollups')
+        if locked:
+            raise CommandError(f'Ошибок «database is locked»: {locked}')
+        self.stdout.write(self.style.SUCCESS('Готово, итоги сходятся'))
+
+    def _collect(self, workers, results, timeout):
+        """Собирает статистику процессов; не ждёт вечно, если какой-то из них упал."""
+        stats = []
+        deadline = time.monotonic() + timeout
+        while len(stats) < len(workers):
+            try:
+                stats.append(results.get(timeout=1))
+                continue
+            except queue.Empty:
+                pass
+            # упавший процесс уже не положит статистику в очередь
+            failed = [n for n, process in enumerate(workers) if process.exitcode not in (None, 0)]
+            if failed:
+                codes = ', '.join(f'#{n}: {workers[n].exitcode}' for n in failed)
+                raise CommandError(f'Процессы нагрузки завершились с ошибкой ({codes}) — см. трассировку выше')
+            if time.monotonic() > deadline:
+                raise CommandError(f'Процессы нагрузки не ответили за {timeout:.0f} с')
+        return stats
+
+
+def _worker(number, user_ids, options, results):
+    connections.close_all()
+    rng = random.Random(options['seed'] + number)
+    users = list(User.objects.filter(id__in=user_ids))
+    categories = {}
+    for category in Category.objects.filter(user_id__in=user_ids):
+        categories.setdefault((category.user_id, category.type), []).append(category)
+
+    stats = {'reads': [], 'writes': [], 'locked': 0}
+    created, sessions = [], []
+    deadline = time.monotonic() + options['seconds']
+    while time.monotonic() < deadline:
+        user = rng.choice(users)
+        is_write = rng.random() < options['write_ratio']
+        start = time.perf_counter()
+        try:
+            if is_write:
+                _write(user, rng, categories, created, sessions)
+            else:
+                _read(user)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            stats['locked'] += 1
+            continue
+        stats['writes' if is_write else 'reads'].append((time.perf_counter() - start) * 1000)
+
+    # убираем за собой: добавленные транзакции и сессии
+    for tx in created:
+        with transaction.atomic():
+            rollups.apply(tx, -1)
+            tx.delete()
+    for session in sessions:
+        session.delete()
+    connections.close_all()
+    results.put(stats)
+
+
+def _read(user):
+    today = timezone.localdate()
+    ledger.get(user)
+    income_expense_series(user, today - timedelta(days=30), today)
+    list(Transaction.objects.filter(user=user).select_related('category').order_by('-date')[:50])
+
+
+def _write(user, rng, categories, created, sessions):
+    action = rng.random()
+    if action < 0.2:
+        # сохранение сессии, как при входе; для signed_cookies в БД ничего не пишется
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session['stress'] = rng.random()
+        session.save()
+        sessions.append(session)
+    elif action < 0.4 and created:
+        tx = created.pop(rng.randrange(len(created)))
+        with transaction.atomic():
+            rollups.apply(tx, -1)
+            tx.delete()
+    else:
+        type_ = rng.choice(['income', 'expense'])
+        category = rng.choice(categories.get((user.id, type_)) or [None])
+        with transaction.atomic():
+            tx = Transaction.objects.create(
+                user=user,
+                category=category,
+                type=type_,
+                amount=Decimal(rng.randint(100, 500000)) / 100,
+                description='stress',
+                date=timezone.now() - timedelta(days=rng.randint(0, 60)),
+            )
+            rollups.apply(tx)
+        created.append(tx)
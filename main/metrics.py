@@ -0,0 +1,86 @@
+"""Метрики запросов в памяти процесса и их вывод в текстовом формате Prometheus."""
+import threading
+from collections import defaultdict
+
+from . import datacache
+
+# верхние границы корзин гистограммы времени ответа, в секундах
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+
+
+class _ViewStats:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.sql_queries = 0
+        self.sql_duration = 0.0
+        self.render_duration = 0.0
+
+
+_views = defaultdict(_ViewStats)
+
+
+def observe(view, duration, sql_queries, sql_duration, render_duration):
+    """Учитывает один обработанный запрос к view (длительности — в секундах)."""
+    with _lock:
+        stats = _views[view]
+        stats.count += 1
+        stats.duration += duration
+        stats.sql_queries += sql_queries
+        stats.sql_duration += sql_duration
+        stats.render_duration += render_duration
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                stats.buckets[i] += 1
+
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus (version 0.0.4)."""
+    with _lock:
+        snapshot = {
+            view: (list(s.buckets), s.count, s.duration, s.sql_queries, s.sql_duration, s.render_duration)
+            for view, s in sorted(_views.items())
+        }
+
+    lines = [
+        '# HELP mybudget_request_duration_seconds Время обработки запроса.',
+        '# TYPE mybudget_request_duration_seconds histogram',
+    ]
+    for view, (buckets, count, duration, *_) in snapshot.items():
+        # в Prometheus корзины кумулятивные, а observe уже считает «<= границы»
+        for bound, value in zip(BUCKETS, buckets):
+            lines.append(f'mybudget_request_duration_seconds_bucket{{view="{_label(view)}",le="{bound}"}} {value}')
+        lines.append(f'mybudget_request_duration_seconds_bucket{{view="{_label(view)}",le="+Inf"}} {count}')
+        lines.append(f'mybudget_request_duration_seconds_sum{{view="{_label(view)}"}} {duration:.6f}')
+        lines.append(f'mybudget_request_duration_seconds_count{{view="{_label(view)}"}} {count}')
+
+    for name, index, help_text in (
+        ('mybudget_sql_queries_total', 3, 'Число SQL-запросов.'),
+        ('mybudget_sql_duration_seconds_total', 4, 'Время выполнения SQL-запросов.'),
+        ('mybudget_template_render_seconds_total', 5, 'Время рендеринга шаблонов.'),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for view, values in snapshot.items():
+            value = values[index]
+            lines.append(f'{name}{{view="{_label(view)}"}} {value if isinstance(value, int) else f"{value:.6f}"}')
+
+    cache = datacache.stats()
+    lines += [
+        '# HELP mybudget_data_cache_requests_total Обращения к кэшу данных пользователей.',
+        '# TYPE mybudget_data_cache_requests_total counter',
+        f'mybudget_data_cache_requests_total{{result="hit"}} {cache["hits"]}',
+        f'mybudget_data_cache_requests_total{{result="miss"}} {cache["misses"]}',
+    ]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,157 @@
+import logging
+import time
+from contextvars import ContextVar
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from . import authcache, metrics, usertz
+from .templating import render_time
+
+logger = logging.getLogger('main.performance')
+
+
+class _QueryTimer:
+    """execute_wrapper: считает SQL-запросы и их время, при необходимости запоминает текст."""
+
+    def __init__(self, keep_sql):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_sql = keep_sql
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if self.keep_sql and len(self.queries) < 200:
+                self.queries.append((duration, sql))
+
+
+# таймер текущего запроса. ConnectionHandler хранит соединения отдельно для каждого потока,
+# а ORM из async-кода ходит в БД из потока sync_to_async — поэтому обёртка ставится на каждое
+# соединение при его создании и ищет таймер в контексте, который sync_to_async копирует в поток
+_queries = ContextVar('performance_queries', default=None)
+
+
+def _record(execute, sql, params, many, context):
+    queries = _queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    return queries(execute, sql, params, many, context)
+
+
+def install(connection):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    install(connection)
+
+
+class PerformanceMiddleware:
+    """Время запроса, число и время SQL, время рендеринга шаблонов — по имени URL.
+
+    Добавляет заголовок Server-Timing, копит гистограммы в main.metrics (отдаются на /metrics)
+    и пишет SQL запросов медленнее SLOW_REQUEST_MS в лог main.performance.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', None)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        queries, timer, tokens = self._start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(tokens)
+        return self._finish(request, response, time.perf_counter() - start, queries, timer)
+
+    async def __acall__(self, request):
+        queries, timer, tokens = self._start()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._stop(tokens)
+        return self._finish(request, response, time.perf_counter() - start, queries, timer)
+
+    def _start(self):
+        # соединения, открытые до загрузки этого модуля, сигнала connection_created уже не получат
+        for connection in connections.all(initialized_only=True):
+            install(connection)
+        timer = [0.0]
+        queries = _QueryTimer(keep_sql=self.slow_ms is not None)
+        return queries, timer, (_queries.set(queries), render_time.set(timer))
+
+    def _stop(self, tokens):
+        _queries.reset(tokens[0])
+        render_time.reset(tokens[1])
+
+    def _finish(self, request, response, duration, queries, timer):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe(view, duration, queries.count, queries.duration, timer[0])
+
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={duration * 1000:.1f}',
+            f'sql;dur={queries.duration * 1000:.1f};desc="{queries.count} queries"',
+            f'tpl;dur={timer[0] * 1000:.1f}',
+        ])
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL: %d за %.0f мс\n%s',
+                request.method, request.path, view, duration * 1000, queries.count, queries.duration * 1000,
+                '\n'.join(f'  [{d * 1000:.1f} мс] {sql}' for d, sql in queries.queries),
+            )
+        return response
+
+
+async def _auser(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await authcache.aget_user(request)
+    return request._acached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, который берёт пользователя из main.authcache, а не из auth_user."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: authcache.get_user(request))
+        request.auser = partial(_auser, request)
+
+
+class TimezoneMiddleware(MiddlewareMixin):
+    """Включает на время запроса зону пользователя: «сегодня», ввод и вывод времени — по его календарю."""
+
+    def process_request(self, request):
+        if request.user.is_authenticated:
+            timezone.activate(usertz.zone(request.user.id))
+        else:
+            timezone.deactivate()
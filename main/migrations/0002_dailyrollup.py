@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def fill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('main', 'Transaction')
+    DailyRollup = apps.get_model('main', 'DailyRollup')
+    rows = (
+        Transaction.objects
+        .annotate(day=TruncDate('date', tzinfo=timezone.get_default_timezone()))
+        .values('user_id', 'day', 'type', 'category_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create((DailyRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=18)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'type', 'category'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:07
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def fill_ledgers(apps, schema_editor):
+    Transaction = apps.get_model('main', 'Transaction')
+    Ledger = apps.get_model('main', 'Ledger')
+    rows = (
+        Transaction.objects
+        .values('user_id')
+        .annotate(income=Sum('amount', filter=Q(type='income')), expenses=Sum('amount', filter=Q(type='expense')))
+        .order_by()
+    )
+    Ledger.objects.bulk_create(
+        (
+            Ledger(
+                user_id=row['user_id'],
+                income=row['income'] or 0,
+                expenses=row['expenses'] or 0,
+                balance=(row['income'] or 0) - (row['expenses'] or 0),
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ledger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('expenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_ledger_checkpoint')],
+            },
+        ),
+        migrations.RunPython(fill_ledgers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledger',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
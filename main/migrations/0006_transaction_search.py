@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Внешнее содержимое (content=) — текст хранится только в main_transaction, в индексе лишь триграммы.
+# Триггеры срабатывают и на bulk_create / QuerySet.update / delete, в отличие от сигналов моделей.
+CREATE_SQL = [
+    """CREATE VIRTUAL TABLE main_transaction_fts USING fts5(
+        description, content='main_transaction', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER main_transaction_fts_ai AFTER INSERT ON main_transaction BEGIN
+        INSERT INTO main_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    """CREATE TRIGGER main_transaction_fts_ad AFTER DELETE ON main_transaction BEGIN
+        INSERT INTO main_transaction_fts(main_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END""",
+    """CREATE TRIGGER main_transaction_fts_au AFTER UPDATE OF description ON main_transaction BEGIN
+        INSERT INTO main_transaction_fts(main_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO main_transaction_fts(rowid, description) VALUES (new.id, new.description);
+    END""",
+    # индекс по уже существующим транзакциям
+    "INSERT INTO main_transaction_fts(main_transaction_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER main_transaction_fts_ai',
+    'DROP TRIGGER main_transaction_fts_ad',
+    'DROP TRIGGER main_transaction_fts_au',
+    'DROP TABLE main_transaction_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0005_ledger_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearch',
+            fields=[
+                ('transaction', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='main.transaction')),
+                ('description', models.TextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'main_transaction_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, reverse_sql=DROP_SQL),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+
+def fill_monthly(apps, schema_editor):
+    DailyRollup = apps.get_model('main', 'DailyRollup')
+    MonthlyRollup = apps.get_model('main', 'MonthlyRollup')
+    rows = (
+        DailyRollup.objects
+        .annotate(month=TruncMonth('day'))
+        .values('user_id', 'month', 'type', 'category_id')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
+    MonthlyRollup.objects.bulk_create((MonthlyRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='monthly_limit',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Лимит в месяц'),
+        ),
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=18)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='monthly_rollups', to='main.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'type', 'category'), name='unique_monthly_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_monthly, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:58
+
+import zoneinfo
+
+import django.db.models.deletion
+import main.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+BATCH_SIZE = 5000
+
+
+def fill_local_date(apps, schema_editor):
+    """local_date в зоне по умолчанию (профилей ещё нет), затем итоги по дням и месяцам заново."""
+    Transaction = apps.get_model('main', 'Transaction')
+    DailyRollup = apps.get_model('main', 'DailyRollup')
+    MonthlyRollup = apps.get_model('main', 'MonthlyRollup')
+    Ledger = apps.get_model('main', 'Ledger')
+    LedgerCheckpoint = apps.get_model('main', 'LedgerCheckpoint')
+    zone = zoneinfo.ZoneInfo(settings.DEFAULT_USER_TIME_ZONE)
+
+    # executemany простого UPDATE по id заметно быстрее bulk_update (CASE по каждой строке)
+    rows = Transaction.objects.values_list('id', 'date').iterator(chunk_size=BATCH_SIZE)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'UPDATE main_transaction SET local_date = %s WHERE id = %s',
+            ((timezone.localdate(date, zone), pk) for pk, date in rows),
+        )
+
+    # прежние итоги считались по дням в UTC
+    DailyRollup.objects.all().delete()
+    daily = (
+        Transaction.objects
+        .values('user_id', 'type', 'category_id', day=F('local_date'))
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create((DailyRollup(**row) for row in daily.iterator()), batch_size=1000)
+    MonthlyRollup.objects.all().delete()
+    monthly = (
+        DailyRollup.objects
+        .annotate(month=TruncMonth('day'))
+        .values('user_id', 'month', 'type', 'category_id')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
+    MonthlyRollup.objects.bulk_create((MonthlyRollup(**row) for row in monthly.iterator()), batch_size=1000)
+
+    for point in LedgerCheckpoint.objects.all():
+        totals = Transaction.objects.filter(user_id=point.user_id, local_date__lte=point.day).aggregate(
+            income=Sum('amount', filter=Q(type='income')),
+            expenses=Sum('amount', filter=Q(type='expense')),
+        )
+        point.balance = (totals['income'] or 0) - (totals['expenses'] or 0)
+        point.save(update_fields=['balance'])
+    Ledger.objects.update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_monthly_budgets'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.CharField(default=main.models.default_time_zone, max_length=64, verbose_name='Часовой пояс')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='local_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'local_date'], name='tx_user_local_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_local_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:06
+
+from datetime import datetime, time, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_current_amounts(apps, schema_editor):
+    """Накопленное до появления пополнений — одним пополнением на дату создания цели."""
+    Goal = apps.get_model('main', 'Goal')
+    GoalContribution = apps.get_model('main', 'GoalContribution')
+    goals = Goal.objects.exclude(current_amount=0).values_list('id', 'user_id', 'current_amount', 'created_at')
+    GoalContribution.objects.bulk_create(
+        (
+            GoalContribution(
+                goal_id=goal_id, user_id=user_id, amount=amount,
+                created_at=datetime.combine(created, time.min, tzinfo=timezone.utc),
+            )
+            for goal_id, user_id, amount, created in goals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_profile_local_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('goal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='main.goal')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='goal_contributions', to='main.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_contributions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['goal', 'created_at'], name='goal_contribution_goal_idx')],
+            },
+        ),
+        migrations.RunPython(record_current_amounts, migrations.RunPython.noop),
+    ]
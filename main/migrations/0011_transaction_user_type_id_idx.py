@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_goal_contributions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'id'], name='tx_user_type_id_idx'),
+        ),
+    ]
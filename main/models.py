@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.utils import timezone
 from django.db import models
+from django.db.models import Case, DateField, ExpressionWrapper, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, ExtractDay, ExtractMonth, ExtractYear, Greatest, Round
 from django.contrib.auth.models import User
-from datetime import date
-from dateutil.relativedelta import relativedelta
+from datetime import timedelta
+from decimal import Decimal
 
 
 class Category(models.Model):
@@ -14,6 +17,10 @@ class Category(models.Model):
 
     name = models.CharField(max_length=50, verbose_name='Название категории')
     type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name='Тип')
+    # бюджет на месяц (только для расходов); потрачено за месяц — в MonthlyRollup
+    monthly_limit = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Лимит в месяц',
+    )
 
     def __str__(self):
         return f"{self.name} ({'Доход' if self.type == 'income' else 'Расход'})"
@@ -24,6 +31,26 @@ TYPE_CHOICES = [
     ('expense', 'Расход'),
 ]
 
+def default_time_zone():
+    return settings.DEFAULT_USER_TIME_ZONE
+
+
+class Profile(models.Model):
+    """Настройки пользователя. Временная зона задаёт его календарные дни (см. main/usertz.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
+    timezone = models.CharField(max_length=64, default=default_time_zone, verbose_name='Часовой пояс')
+
+    def __str__(self):
+        return f"{self.user}: {self.timezone}"
+
+
+class TransactionQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # save при bulk_create не вызывается — local_date проставляется здесь
+        from .usertz import localize
+        return super().bulk_create(localize(list(objs)), *args, **kwargs)
+
+
 class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
@@ -31,35 +58,232 @@ class Transaction(models.Model):
     description = models.TextField(blank=True)
     date = models.DateTimeField(default=timezone.now)
     type = models.CharField(max_length=18, choices=TYPE_CHOICES, verbose_name='Тип операции')
+    # дата в зоне пользователя (Profile.timezone), заполняется при сохранении; по ней
+    # считаются дневные и месячные итоги. null — только чтобы колонка добавлялась без
+    # пересоздания таблицы (с ней связаны триггеры полнотекстового поиска, миграция 0006)
+    local_date = models.DateField(null=True, editable=False)
+
+    objects = TransactionQuerySet.as_manager()
+
+    class Meta:
+        # Все выборки идут по пользователю + тип / категория / диапазон дат,
+        # сортировка — по дате или сумме (см. transactions_list).
+        indexes = [
+            models.Index(fields=['user', 'date'], name='tx_user_date_idx'),
+            models.Index(fields=['user', 'type', 'date'], name='tx_user_type_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='tx_user_category_date_idx'),
+            models.Index(fields=['user', 'amount'], name='tx_user_amount_idx'),
+            models.Index(fields=['user', 'type', 'id'], name='tx_user_type_id_idx'),  # keyset по типу
+            models.Index(fields=['user', 'local_date'], name='tx_user_local_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} — {self.amount} сом"
 
+    def save(self, *args, **kwargs):
+        from .usertz import local_date  # usertz импортирует модели
+        self.local_date = local_date(self.user_id, self.date)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'local_date'}
+        super().save(*args, **kwargs)
+
+
+class GoalQuerySet(models.QuerySet):
+    def with_progress(self, today=None):
+        """Цели с прогрессом, посчитанным в SQL (одним запросом для любого числа целей).
+
+        progress_percent — накоплено в процентах от цели (0–100+, один знак после запятой);
+        remaining — сколько осталось накопить; months_left — полных месяцев до срока, как
+        relativedelta (но не меньше 1, пока срок не наступил; 0 — срок прошёл);
+        monthly_needed — сколько откладывать в месяц, чтобы успеть.
+        """
+        today = today or timezone.localdate()
+        remaining = Greatest(F('target_amount') - F('current_amount'), Value(Decimal('0')))
+        months = (
+            (ExtractYear('deadline') - today.year) * 12 + ExtractMonth('deadline') - today.month
+            # последний неполный месяц не считается, если только срок — не последний день месяца
+            # (relativedelta(31.03 → 30.06) = 3 месяца)
+            - Case(When(Q(deadline_day__lt=today.day) & Q(after_deadline_day__gt=1), then=1), default=0)
+        )
+        return self.alias(
+            deadline_day=ExtractDay('deadline'),
+            after_deadline_day=ExtractDay(ExpressionWrapper(F('deadline') + timedelta(days=1), DateField())),
+        ).annotate(
+            remaining=ExpressionWrapper(remaining, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            progress_percent=Case(
+                When(target_amount=0, then=Value(0.0)),
+                default=Round(Cast('current_amount', FloatField()) * 100 / Cast('target_amount', FloatField()), 1),
+                output_field=FloatField(),
+            ),
+            months_left=Case(When(deadline__lte=today, then=0), default=Greatest(months, 1)),
+            monthly_needed=Cast(remaining, FloatField()) / Greatest(F('months_left'), 1),
+        )
+
 
 class Goal(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     target_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # сумма всех GoalContribution цели; меняется только через F() (см. views.add_to_goal)
     current_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     deadline = models.DateField()
     created_at = models.DateField(auto_now_add=True)
 
-    @property
-    def progress_percent(self):
-        if self.target_amount == 0:
-            return 0
-        return round((self.current_amount / self.target_amount) * 100, 1)
-
-    @property
-    def months_left(self):
-        today = date.today()
-        if self.deadline <= today:
-            return 0
-        diff = relativedelta(self.deadline, today)
-        return diff.years * 12 + diff.months or 1
-
-    @property
-    def monthly_needed(self):
-        remaining = max(self.target_amount - self.current_amount, 0)
-        months = self.months_left
-        return remaining / months if months else remaining
\ No newline at end of file
+    objects = GoalQuerySet.as_manager()
+
+
+class GoalContribution(models.Model):
+    """Пополнение цели (отрицательное — исправление суммы при редактировании цели).
+
+    Сумма пополнений равна Goal.current_amount. Пополнение может быть списано с баланса
+    как расход — тогда transaction ссылается на эту транзакцию.
+    """
+    goal = models.ForeignKey(Goal, on_delete=models.CASCADE, related_name='contributions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='goal_contributions')
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(default=timezone.now)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='goal_contributions',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['goal', 'created_at'], name='goal_contribution_goal_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.goal.name}: {self.amount} сом"
+
+
+class DailyRollup(models.Model):
+    """Суммы и количество транзакций пользователя за день в разрезе типа и категории.
+
+    Поддерживается инкрементально при каждом изменении транзакций (см. main/rollups.py),
+    поэтому итоги на страницах читаются из этой таблицы, а не из всей истории Transaction.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    type = models.CharField(max_length=18, choices=TYPE_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'type', 'category'], name='unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.get_type_display()}: {self.total} сом ({self.count})"
+
+
+class MonthlyRollup(models.Model):
+    """Суммы и количество транзакций пользователя за месяц в разрезе типа и категории.
+
+    Поддерживается вместе с DailyRollup (main/rollups.py). Из неё одним запросом читается
+    потраченное по категориям за месяц для бюджетов (dashboard.budgets).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()  # первое число месяца
+    type = models.CharField(max_length=18, choices=TYPE_CHOICES)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='monthly_rollups',
+    )
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'type', 'category'], name='unique_monthly_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%m.%Y} {self.get_type_display()}: {self.total} сом ({self.count})"
+
+
+class Ledger(models.Model):
+    """Текущие итоги пользователя за всё время: доходы, расходы и баланс.
+
+    Обновляются атомарно (F-выражениями) при каждом изменении транзакций,
+    поэтому баланс на главной читается одной строкой, независимо от длины истории.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='ledger')
+    income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    expenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+    # растёт при любом изменении данных пользователя — часть ключа кэша (main/datacache.py)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user}: {self.balance} сом"
+
+
+class LedgerCheckpoint(models.Model):
+    """Баланс пользователя на конец дня day — точка, от которой восстанавливается баланс на прошлую дату."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ledger_checkpoints')
+    day = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_ledger_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} на {self.day}: {self.balance} сом"
+
+
+class TransactionSearch(models.Model):
+    """Полнотекстовый индекс описаний транзакций — виртуальная таблица FTS5 (триграммы).
+
+    Таблицу и триггеры, которые держат её в синхронизации с main_transaction, создаёт
+    миграция 0006; Django таблицей не управляет (см. main/search.py). rank — оценка
+    bm25 совпадения (меньше — лучше), доступна только в запросе с MATCH.
+    """
+    transaction = models.OneToOneField(
+        Transaction, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, related_name='search',
+    )
+    description = models.TextField()
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'main_transaction_fts'
+
+
+class Job(models.Model):
+    """Фоновая задача (импорт, выгрузка, пересборка итогов), которую выполняет manage.py run_jobs.
+
+    Строка — одновременно очередь и состояние: воркер забирает queued-задачу одним UPDATE
+    (см. main/jobs.py), пишет сюда ход выполнения, а страница задачи опрашивает его.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    kind = models.CharField(max_length=30)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(default=0)  # проценты
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # обновляется вместе с progress: по нему находятся задачи упавшего воркера
+    updated_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}: {self.get_status_display()}"
@@ -0,0 +1,62 @@
+"""Keyset-пагинация (по курсору) для списков, отсортированных по одному полю + id.
+
+Вместо OFFSET следующая страница выбирается условием «после последней показанной
+строки», поэтому страница N стоит столько же, сколько первая, и использует те же
+индексы (user, date) / (user, amount) / (user, type, id).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+PAGE_SIZE = 50
+
+# как превратить значение поля из курсора обратно в python-значение
+PARSERS = {
+    'date': datetime.fromisoformat,
+    'amount': Decimal,
+    'type': str,
+    'rank': float,  # релевантность поиска (main/search.py)
+}
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else str(value), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    """(значение, id) из строки курсора или None, если курсор битый."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return PARSERS[field](value), int(pk)
+    except (binascii.Error, ValueError, TypeError, InvalidOperation, KeyError):
+        return None
+
+
+def keyset_page(queryset, sort, cursor=None, size=PAGE_SIZE):
+    """Одна страница queryset, отсортированного по sort ('date', '-amount', ...) и id.
+
+    Возвращает (список объектов, курсор следующей страницы или None).
+    """
+    field = sort.lstrip('-')
+    descending = sort.startswith('-')
+    order = ('-' if descending else '') + 'id'
+    queryset = queryset.order_by(sort, order)
+
+    position = decode_cursor(cursor, field) if cursor else None
+    if position:
+        value, pk = position
+        op = 'lt' if descending else 'gt'
+        queryset = queryset.filter(Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk}))
+
+    rows = list(queryset[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, field), last.pk)
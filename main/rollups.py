@@ -0,0 +1,222 @@
+"""Инкрементальное обновление дневных и месячных итогов (DailyRollup, MonthlyRollup).
+
+Каждое изменение транзакции превращается в дельту (+сумма/+1 при добавлении,
+-сумма/-1 при удалении) для строки (user, day, type, category) и той же дельтой
+для строки месяца (user, month, type, category). Вызывать нужно внутри той же
+транзакции БД, что и само изменение, чтобы итоги не разъезжались с исходными данными.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from . import ledger
+from .ledger import cents
+from .models import DailyRollup, MonthlyRollup, Transaction
+
+
+def rollup_day(tx):
+    """День, к которому относится транзакция, — в зоне её пользователя (см. main/usertz.py)."""
+    return tx.local_date
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def add(user_id, day, type_, category_id, total, count):
+    """Прибавляет total и count к строкам итогов дня и месяца, создавая их при необходимости."""
+    _increment(DailyRollup, total, count, user_id=user_id, day=day, type=type_, category_id=category_id)
+    _increment(
+        MonthlyRollup, total, count, user_id=user_id, month=month_of(day), type=type_, category_id=category_id,
+    )
+
+
+def _increment(model, total, count, **key):
+    rows = model.objects.filter(**key)
+    if rows.update(total=F('total') + total, count=F('count') + count):
+        return
+    try:
+        # savepoint: параллельный запрос мог успеть создать ту же строку
+        with transaction.atomic():
+            model.objects.create(**key, total=total, count=count)
+    except IntegrityError:
+        rows.update(total=F('total') + total, count=F('count') + count)
+
+
+def apply(tx, sign=1):
+    """Учитывает транзакцию в итогах: sign=1 при создании, sign=-1 при удалении.
+
+    Редактирование — это apply(старое состояние, -1) и apply(новое состояние, 1).
+    Вместе с дневными итогами сдвигается и баланс пользователя (Ledger).
+    """
+    day = rollup_day(tx)
+    add(tx.user_id, day, tx.type, tx.category_id, sign * tx.amount, sign)
+    ledger.shift(tx.user_id, day, tx.type, sign * tx.amount)
+
+
+def apply_many(transactions, sign=1):
+    """То же, что apply, но для пачки транзакций одного пользователя (импорт, массовые операции).
+
+    Дельты сворачиваются в памяти, затем существующие строки итогов читаются одним
+    запросом (с блокировкой) и переписываются целиком (DELETE + bulk_create),
+    поэтому число запросов не зависит от размера пачки.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    user_id = None
+    for tx in transactions:
+        user_id = tx.user_id
+        delta = deltas[(rollup_day(tx), tx.type, tx.category_id)]
+        delta[0] += sign * tx.amount
+        delta[1] += sign
+    if deltas:
+        apply_deltas(user_id, deltas)
+
+
+def grouped(transactions):
+    """Суммы и количество транзакций queryset-а по ключам итогов: {(day, type, category_id): [total, count]}.
+
+    Один GROUP BY запрос — для массовых операций, где транзакции не загружаются в память.
+    """
+    rows = (
+        transactions
+        .values_list('local_date', 'type', 'category_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return {(day, type_, category_id): [cents(total), count] for day, type_, category_id, total, count in rows}
+
+
+def apply_deltas(user_id, deltas):
+    """Прибавляет дельты {(day, type, category_id): [total, count]} к итогам дня и месяца и сдвигает Ledger.
+
+    Число запросов не зависит от числа дельт. Нулевые дельты (транзакции ушли и пришли
+    в ту же строку) пропускаются; версия данных растёт в любом случае.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        ledger.bump(user_id)
+        return
+
+    _merge(DailyRollup, 'day', user_id, deltas)
+    _merge(MonthlyRollup, 'month', user_id, by_month(deltas))
+
+    amounts = defaultdict(int)
+    for (day, type_, _), (total, _) in deltas.items():
+        amounts[(day, type_)] += total
+    ledger.shift_many(user_id, amounts)
+
+
+def _merge(model, period, user_id, deltas):
+    """Прибавляет дельты {(период, type, category_id): [total, count]} к строкам model."""
+    periods = [key[0] for key in deltas]
+    rows = {
+        (getattr(row, period), row.type, row.category_id): row
+        for row in model.objects.select_for_update().filter(
+            user_id=user_id, **{f'{period}__range': (min(periods), max(periods))},
+        )
+        if (getattr(row, period), row.type, row.category_id) in deltas
+    }
+    model.objects.filter(pk__in=[row.pk for row in rows.values()]).delete()
+    merged = []
+    for (value, type_, category_id), (total, count) in deltas.items():
+        row = rows.get((value, type_, category_id))
+        if row:
+            total, count = row.total + total, row.count + count
+        merged.append(model(
+            user_id=user_id, type=type_, category_id=category_id, total=total, count=count, **{period: value},
+        ))
+    model.objects.bulk_create(merged, batch_size=500)
+
+
+def move_category(user, source_id, target_id):
+    """Переносит итоги категории source_id в target_id (None — «без категории»).
+
+    Нужно перед удалением категории (иначе SET_NULL оставит дубли строк без категории)
+    и при слиянии категорий. Строки источника читаются одним запросом и прибавляются
+    к строкам цели так же, как дельты apply_many; доходы и расходы при этом не меняются.
+    """
+    source = DailyRollup.objects.filter(user=user, category_id=source_id)
+    deltas = {
+        (day, type_, target_id): [total, count]
+        for day, type_, total, count in source.filter(count__gt=0).values_list('day', 'type', 'total', 'count')
+    }
+    source.delete()
+    MonthlyRollup.objects.filter(user=user, category_id=source_id).delete()
+    if deltas:
+        _merge(DailyRollup, 'day', user.id, deltas)
+        _merge(MonthlyRollup, 'month', user.id, by_month(deltas))
+
+
+def compute(user):
+    """Итоги пользователя, посчитанные заново по таблице Transaction."""
+    rows = (
+        Transaction.objects
+        .filter(user=user)
+        .values('type', 'category_id', day=F('local_date'))
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return {(row['day'], row['type'], row['category_id']): (cents(row['total']), row['count']) for row in rows}
+
+
+def stored(user):
+    """Итоги пользователя, как они сейчас лежат в DailyRollup (пустые строки пропускаются)."""
+    rows = (
+        DailyRollup.objects
+        .filter(user=user)
+        .values('day', 'type', 'category_id')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by()
+    )
+    return {
+        (row['day'], row['type'], row['category_id']): (cents(row['total']), row['count'])
+        for row in rows if row['count']
+    }
+
+
+def by_month(daily):
+    """Итоги по дням {(day, type, category_id): (total, count)}, свёрнутые по месяцам."""
+    monthly = defaultdict(lambda: (0, 0))
+    for (day, type_, category_id), (total, count) in daily.items():
+        previous = monthly[(month_of(day), type_, category_id)]
+        monthly[(month_of(day), type_, category_id)] = (previous[0] + total, previous[1] + count)
+    return dict(monthly)
+
+
+def stored_monthly(user):
+    """Месячные итоги пользователя из MonthlyRollup (пустые строки пропускаются)."""
+    rows = MonthlyRollup.objects.filter(user=user, count__gt=0).values_list(
+        'month', 'type', 'category_id', 'total', 'count',
+    )
+    return {(month, type_, category_id): (cents(total), count) for month, type_, category_id, total, count in rows}
+
+
+@transaction.atomic
+def rebuild(user):
+    """Пересоздаёт все строки дневных и месячных итогов пользователя с нуля."""
+    daily = compute(user)
+    DailyRollup.objects.filter(user=user).delete()
+    DailyRollup.objects.bulk_create(
+        DailyRollup(user=user, day=day, type=type_, category_id=category_id, total=total, count=count)
+        for (day, type_, category_id), (total, count) in daily.items()
+    )
+    MonthlyRollup.objects.filter(user=user).delete()
+    MonthlyRollup.objects.bulk_create(
+        MonthlyRollup(user=user, month=month, type=type_, category_id=category_id, total=total, count=count)
+        for (month, type_, category_id), (total, count) in by_month(daily).items()
+    )
+    ledger.bump(user.id)
+
+
+def verify(user):
+    """Ключи (day, type, category_id), по которым сохранённые итоги расходятся с пересчётом,
+    затем ключи (month, type, category_id) расхождений месячных итогов."""
+    daily = compute(user)
+    mismatches = []
+    for expected, actual in ((daily, stored(user)), (by_month(daily), stored_monthly(user))):
+        mismatches += sorted(
+            (key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)),
+            key=lambda key: (key[0], key[1], key[2] or 0),
+        )
+    return mismatches
@@ -0,0 +1,61 @@
+"""Поиск транзакций по описанию через SQLite FTS5 с триграммным токенизатором.
+
+Триграммы дают поиск по подстроке (в том числе внутри слова и без учёта регистра
+кириллицы), но только для фрагментов от трёх символов: более короткие слова запроса
+не учитываются (icontains по ним перебирал бы все транзакции пользователя).
+
+Таблицу main_transaction_fts и триггеры синхронизации создаёт миграция 0006. Миграции,
+которые пересоздают main_transaction (на SQLite так делает большинство AlterField),
+удаляют вместе со старой таблицей и триггеры — их нужно создать заново.
+"""
+from django.db.models import F, Func, IntegerField, Lookup
+
+from .models import Transaction, TransactionSearch
+
+MIN_TERM = 3  # триграммный индекс не находит фрагменты короче
+
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+TransactionSearch._meta.get_field('description').register_lookup(Match)
+
+
+def fts_query(text):
+    """Строка запроса FTS5: каждое слово от MIN_TERM символов — отдельная фраза, все через AND.
+    None, если таких слов нет."""
+    terms = [word for word in text.split() if len(word) >= MIN_TERM]
+    if not terms:
+        return None
+    return ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _unindexed(field):
+    """+поле: по такому условию SQLite не берёт индекс. Иначе без статистики ANALYZE план
+    начинается с индекса (user, ...) и выполняет MATCH для каждой транзакции пользователя,
+    а нужно наоборот — перебрать найденное FTS и взять строки по первичному ключу."""
+    return Func(F(field), template='+%(expressions)s', output_field=IntegerField())
+
+
+def search(user, text, category_id=None):
+    """Транзакции пользователя (и категории), в описании которых есть все слова text
+    (см. fts_query), с аннотацией rank (меньше — точнее)."""
+    transactions = Transaction.objects.alias(owner=_unindexed('user_id')).filter(owner=user.id)
+    if category_id:
+        transactions = transactions.alias(category_key=_unindexed('category_id')).filter(category_key=category_id)
+    return transactions.filter(search__description__match=fts_query(text)).annotate(rank=F('search__rank'))
+
+
+def filtered(user, category_id=None, query=''):
+    """Транзакции списка: с поиском по query, если он задан, иначе все (категории category_id)."""
+    if query:
+        return search(user, query, category_id)
+    transactions = Transaction.objects.filter(user=user)
+    if category_id:
+        transactions = transactions.filter(category_id=category_id)
+    return transactions
@@ -0,0 +1,28 @@
+"""Шаблонизатор Django, который засекает время рендеринга (для PerformanceMiddleware)."""
+import contextvars
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+# накопитель времени рендеринга текущего запроса; ставит PerformanceMiddleware
+render_time = contextvars.ContextVar('render_time', default=None)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timer = render_time.get()
+        if timer is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer[0] += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
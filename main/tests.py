@@ -1,3 +1,1086 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import connection, transaction as db_transaction
+from django.db.models import Sum
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import formats, timezone
+
+from . import (
+    analytics, assets, authcache, benchmark, bulk, dashboard, datacache, importers, jobs, ledger, metrics, pagination,
+    rollups, search, timeseries, usertz, views,
+)
+from .ledger import cents
+from .models import (
+    Category, DailyRollup, Goal, GoalContribution, Job, LedgerCheckpoint, MonthlyRollup, Profile, Transaction,
+)
+
+
+# «SCAN main_transaction» без «USING ... INDEX» — полный проход по таблице
+FULL_SCAN = re.compile(r'^SCAN (main_\w+)$')
+# сортировка во временном B-дереве: ORDER BY страницы транзакций не покрыт индексом и каждая
+# страница сортирует всю выборку пользователя (выдачу поиска по рангу это не касается — она мала)
+TEMP_SORT = re.compile(r'^USE TEMP B-TREE FOR (RIGHT PART OF |LAST TERM OF )?ORDER BY$')
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц по таблицам приложения не должны читать таблицы целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('plan@example.com', password='secret')
+        other = User.objects.create_user('other@example.com', password='secret')
+        now = timezone.now()
+        for owner in (cls.user, other):
+            food = Category.objects.create(user=owner, name='Еда', type='expense')
+            salary = Category.objects.create(user=owner, name='Зарплата', type='income')
+            Goal.objects.create(user=owner, name='Отпуск', target_amount=1000, deadline=now.date() + timedelta(days=90))
+            Transaction.objects.bulk_create(
+                Transaction(
+                    user=owner,
+                    category=salary if i % 3 == 0 else food,
+                    type='income' if i % 3 == 0 else 'expense',
+                    amount=Decimal(10 + i),
+                    description=f'Обед {i}' if i % 5 == 0 else '',
+                    date=now - timedelta(days=i % 400, hours=i % 24),
+                )
+                for i in range(500)
+            )
+            rollups.rebuild(owner)
+        cls.category = food
+
+    def setUp(self):
+        cache.clear()  # иначе запросы страниц не дойдут до БД
+        self.client.force_login(self.user)
+
+    def urls(self):
+        yield reverse('main:index')
+        for period in (7, 30, 365):
+            yield f"{reverse('main:reports')}?period={period}"
+        yield f"{reverse('main:reports')}?period=365&step=month"
+        for name in ('main:chart_series', 'main:chart_categories', 'main:chart_summary'):
+            for period in (7, 30, 365):
+                yield f'{reverse(name)}?period={period}'
+        for sort in ('date', '-date', 'amount', '-amount', 'type', '-type'):
+            yield f"{reverse('main:transactions_list')}?sort={sort}"
+            yield f"{reverse('main:transactions_list')}?sort={sort}&category={self.category.id}"
+        for params in ('q=Обед', 'q=Обед&sort=-date', f'q=Обед&category={self.category.id}'):
+            yield f"{reverse('main:transactions_list')}?{params}"
+        yield reverse('main:goals_list')
+        yield reverse('main:categories_list')
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        page = sql.startswith('SELECT') and 'FROM "main_transaction"' in sql and ' MATCH ' not in sql
+        return [detail for detail in plan if FULL_SCAN.match(detail) or page and TEMP_SORT.match(detail)]
+
+    def test_views_do_not_scan_tables(self):
+        for url in self.urls():
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    if not query['sql'].startswith('SELECT') or 'main_' not in query['sql']:
+                        continue
+                    self.assertEqual(self.full_scans(query['sql']), [], query['sql'])
+
+
+class SearchTests(TestCase):
+    """Поиск по комментарию: индекс FTS5 обновляется триггерами и не показывает чужие транзакции."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('search@example.com', password='secret')
+        cls.other = User.objects.create_user('search-other@example.com', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Еда', type='expense')
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, category=cls.food, type='expense', amount=5, description='Кофе в Кофейне'),
+            Transaction(user=cls.user, type='expense', amount=7, description='Обед, кафе у дома'),
+            Transaction(user=cls.other, type='expense', amount=9, description='кофейня'),
+        ])
+
+    def found(self, text, category_id=None):
+        return sorted(search.search(self.user, text, category_id).values_list('description', flat=True))
+
+    def test_substring_case_insensitive(self):
+        self.assertEqual(self.found('КОФЕ'), ['Кофе в Кофейне'])
+        self.assertEqual(self.found('кафе дом'), ['Обед, кафе у дома'])
+        self.assertEqual(self.found('кафе', self.food.id), [])
+
+    def test_index_follows_changes(self):
+        tx = Transaction.objects.create(user=self.user, type='income', amount=100, description='Премия')
+        self.assertEqual(self.found('преми'), ['Премия'])
+        Transaction.objects.filter(pk=tx.pk).update(description='Бонус')
+        self.assertEqual(self.found('преми'), [])
+        self.assertEqual(self.found('бонус'), ['Бонус'])
+        tx.delete()
+        self.assertEqual(self.found('бонус'), [])
+
+    def test_list_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('main:transactions_list'), {'q': 'кофе'})
+        self.assertEqual([t.description for t in response.context['transactions']], ['Кофе в Кофейне'])
+        self.assertEqual(response.context['expenses'], Decimal('5.00'))
+        response = self.client.get(reverse('main:transactions_list'), {'q': 'ко'})
+        self.assertEqual(len(response.context['transactions']), 2)
+        self.assertTrue(response.context['error'])
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+class SessionAuthTests(TestCase):
+    """Сессия в cookie и кэш пользователя: запрос страницы не читает django_session и auth_user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('session@example.com', password='secret')
+
+    def setUp(self):
+        authcache.clear()
+        self.client.force_login(self.user)
+
+    def auth_queries(self):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('main:goals_list'))
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in captured.captured_queries
+                if 'django_session' in q['sql'] or '"auth_user"' in q['sql']]
+
+    def test_user_cached_between_requests(self):
+        self.assertEqual(len(self.auth_queries()), 1)
+        self.assertEqual(self.auth_queries(), [])
+        self.user.first_name = 'Имя'
+        self.user.save()
+        self.assertEqual(len(self.auth_queries()), 1)
+
+    def test_password_change_logs_out(self):
+        self.auth_queries()
+        self.user.set_password('changed')
+        self.user.save()
+        response = self.client.get(reverse('main:goals_list'))
+        self.assertEqual(response.status_code, 302)
+
+
+
+class BudgetTests(TestCase):
+    """Потраченное за месяц по категории следует за добавлением, изменением и удалением транзакций."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget@example.com', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Еда', type='expense', monthly_limit=100)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def spent(self):
+        with self.assertNumQueries(2):  # версия данных + один запрос панели
+            budget, = dashboard.budgets(self.user)
+        return budget['spent'], budget['level']
+
+    def test_counters_follow_transactions(self):
+        now = timezone.localtime()
+        form = {'category': self.food.id, 'description': '', 'date': now.strftime('%Y-%m-%d'), 'time': now.strftime('%H:%M')}
+        self.client.post(reverse('main:transaction_add', args=['expense']), {**form, 'amount': '85'})
+        self.assertEqual(self.spent(), (Decimal('85.00'), 'warning'))
+
+        tx = Transaction.objects.get(user=self.user)
+        self.client.post(reverse('main:transaction_edit', args=[tx.id]), {**form, 'amount': '120'})
+        self.assertEqual(self.spent(), (Decimal('120.00'), 'danger'))
+
+        self.client.post(reverse('main:transaction_delete', args=[tx.id]))
+        self.assertEqual(self.spent(), (Decimal('0.00'), 'success'))
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user).count, 0)
+        self.assertEqual(rollups.verify(self.user), [])
+
+
+class AnalyticsTests(TestCase):
+    """Скользящие средние и сроки целей по темпу накоплений."""
+
+    def test_moving_average(self):
+        self.assertEqual(analytics.moving_average([3, 3, 6, 0], 2).tolist(), [3, 3, 4.5, 3])
+
+    def test_goals_are_reached_in_deadline_order(self):
+        today = timezone.localdate()
+        goals = [
+            (1, Decimal('300'), Decimal('0'), today + timedelta(days=40)),
+            (2, Decimal('500'), Decimal('400'), today + timedelta(days=30)),
+            (3, Decimal('50'), Decimal('50'), today + timedelta(days=10)),
+        ]
+        goals.sort(key=lambda goal: goal[3])  # так их отдаёт analytics._goals
+        by_goal = analytics._goal_forecast(goals, 10.0, today)['by_goal']
+        self.assertEqual(by_goal[3]['eta'], today)
+        self.assertEqual(by_goal[2]['eta'], today + timedelta(days=10))
+        self.assertEqual(by_goal[1]['eta'], today + timedelta(days=40))
+        self.assertTrue(by_goal[1]['on_track'])
+        self.assertIsNone(analytics._goal_forecast(goals, 0.0, today)['by_goal'][1]['eta'])
+
+    def test_goal_beyond_max_date_is_unreachable(self):
+        goals = [(1, 100000, 0, date(2027, 1, 1))]
+        forecast = analytics._goal_forecast(goals, 0.01, date(2026, 10, 18))['by_goal'][1]
+        self.assertIsNone(forecast['eta'])
+        self.assertFalse(forecast['on_track'])
+
+    def test_pages(self):
+        user = User.objects.create_user('analytics@example.com', password='secret')
+        Goal.objects.create(user=user, name='Отпуск', target_amount=1000, current_amount=0,
+                            deadline=timezone.localdate() + timedelta(days=60))
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('main:goals_list')), 'При текущем темпе')
+        response = self.client.get(reverse('main:chart_forecast'))
+        self.assertEqual(len(response.json()['trend']['labels']), analytics.TREND_DAYS)
+
+
+class BulkActionTests(TestCase):
+    """Массовые действия: постоянное число запросов и итоги, совпадающие с пересчётом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('bulk@example.com', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Еда', type='expense')
+        cls.cafe = Category.objects.create(user=cls.user, name='Кафе', type='expense')
+        now = timezone.now()
+        Transaction.objects.bulk_create(
+            Transaction(user=cls.user, category=cls.food, type='expense', amount=i % 50 + 1,
+                        date=now - timedelta(days=i % 60), description=f"{'кофе' if i % 3 else 'обед'} {i}")
+            for i in range(300)
+        )
+        rollups.rebuild(cls.user)
+
+    def assertConsistent(self):
+        self.assertEqual(rollups.verify(self.user), [])
+        self.assertEqual(ledger.get(self.user).balance, ledger.recompute(self.user.id)['balance'])
+
+    def queries(self, action, size):
+        ids = Transaction.objects.filter(user=self.user).order_by('id').values_list('id', flat=True)[:size]
+        with CaptureQueriesContext(connection) as captured:
+            action(Transaction.objects.filter(id__in=list(ids)))
+        self.assertConsistent()
+        return len(captured.captured_queries)
+
+    def test_query_count_does_not_depend_on_selection(self):
+        recategorize = lambda rows: bulk.recategorize(self.user, rows, self.cafe)
+        self.assertEqual(self.queries(recategorize, 3), self.queries(recategorize, 250))
+        change_type = lambda rows: bulk.change_type(self.user, rows, 'income')
+        self.assertEqual(self.queries(change_type, 3), self.queries(change_type, 250))
+        delete = lambda rows: bulk.delete(self.user, rows)
+        self.assertEqual(self.queries(delete, 3), self.queries(delete, 250))
+
+    def test_delete_unlinks_goal_contributions(self):
+        tx = Transaction.objects.filter(user=self.user).first()
+        goal = Goal.objects.create(user=self.user, name='Отпуск', target_amount=1000,
+                                   deadline=timezone.localdate() + timedelta(days=60))
+        contribution = GoalContribution.objects.create(goal=goal, user=self.user, amount=tx.amount, transaction=tx)
+        self.assertEqual(bulk.delete(self.user, Transaction.objects.filter(id=tx.id)), 1)
+        contribution.refresh_from_db()
+        self.assertIsNone(contribution.transaction_id)
+        self.assertConsistent()
+
+    def test_view_and_merge(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('main:transactions_bulk') + '?q=обед',
+            {'action': 'category', 'target_category': self.cafe.id, 'all': '1'},
+        )
+        self.assertRedirects(response, reverse('main:transactions_list') + '?sort=rank&q=%D0%BE%D0%B1%D0%B5%D0%B4',
+                             fetch_redirect_response=False)
+        self.assertEqual(Transaction.objects.filter(user=self.user, category=self.cafe).count(), 100)
+        self.assertConsistent()
+
+        self.client.post(reverse('main:category_merge', args=[self.cafe.id]), {'target': self.food.id})
+        self.assertFalse(Category.objects.filter(id=self.cafe.id).exists())
+        self.assertEqual(Transaction.objects.filter(user=self.user, category=self.food).count(), 300)
+        self.assertConsistent()
+
+
+class TimezoneTests(TestCase):
+    """Дни транзакций и итогов — по часовому поясу пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tz@example.com', password='secret')
+        Profile.objects.create(user=cls.user, timezone='Asia/Bishkek')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    @override_settings(JOBS_INLINE=True)
+    def test_late_evening_is_next_day_in_user_zone(self):
+        # 20:30 UTC 31 января — уже 1 февраля в Бишкеке (UTC+6)
+        form = {'amount': '10', 'description': '', 'date': '2026-02-01', 'time': '02:30'}
+        self.client.post(reverse('main:transaction_add', args=['expense']), form)
+        tx = Transaction.objects.get(user=self.user)
+        self.assertEqual(tx.date.isoformat(), '2026-01-31T20:30:00+00:00')
+        self.assertEqual(tx.local_date.isoformat(), '2026-02-01')
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user).month.isoformat(), '2026-02-01')
+
+        self.client.post(reverse('main:profile'), {'timezone': 'UTC'})
+        tx.refresh_from_db()
+        self.assertEqual(tx.local_date.isoformat(), '2026-01-31')
+        self.assertEqual(MonthlyRollup.objects.get(user=self.user, count__gt=0).month.isoformat(), '2026-01-01')
+        self.assertEqual(rollups.verify(self.user), [])
+
+    def test_writes_ignore_stale_zone_cache(self):
+        self.assertEqual(str(usertz.zone(self.user.id)), 'Asia/Bishkek')  # запомнено в кэше процесса
+        # зону сменил другой процесс: сигнал до этого процесса не дошёл
+        Profile.objects.filter(user=self.user).update(timezone='UTC')
+        moment = datetime(2026, 1, 31, 20, 30, tzinfo=dt_timezone.utc)
+        tx = Transaction.objects.create(user=self.user, type='expense', amount=10, date=moment)
+        [bulk_tx] = Transaction.objects.bulk_create([Transaction(user=self.user, type='income', amount=5, date=moment)])
+        self.assertEqual((tx.local_date.isoformat(), bulk_tx.local_date.isoformat()), ('2026-01-31', '2026-01-31'))
+
+        Transaction.objects.filter(user=self.user).update(local_date=date(2026, 2, 1))
+        usertz.relocalize(self.user)
+        self.assertEqual(set(Transaction.objects.values_list('local_date', flat=True)), {date(2026, 1, 31)})
+
+
+class GoalTests(TestCase):
+    """Пополнения целей: журнал пополнений, расход с баланса и прогресс, посчитанный в SQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('goal@example.com', password='secret')
+        cls.savings = Category.objects.create(user=cls.user, name='Накопления', type='expense')
+        cls.goal = Goal.objects.create(user=cls.user, name='Отпуск', target_amount=1000,
+                                       deadline=timezone.localdate() + timedelta(days=90))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_contributions_add_up(self):
+        url = reverse('main:add_to_goal', args=[self.goal.id])
+        self.client.post(url, {'amount': '100'})
+        self.client.post(url, {'amount': '50.5', 'as_expense': '1', 'category': self.savings.id})
+        self.client.post(reverse('main:goal_edit', args=[self.goal.id]), {
+            'name': 'Отпуск', 'target_amount': '1000', 'current_amount': '120',
+            'deadline': self.goal.deadline.isoformat(),
+        })
+
+        self.goal.refresh_from_db()
+        self.assertEqual(self.goal.current_amount, Decimal('120'))
+        amounts = sorted(self.goal.contributions.values_list('amount', flat=True))
+        self.assertEqual(amounts, [Decimal('-30.5'), Decimal('50.5'), Decimal('100')])
+        expense = GoalContribution.objects.get(transaction__isnull=False).transaction
+        self.assertEqual((expense.amount, expense.category, expense.type), (Decimal('50.5'), self.savings, 'expense'))
+        self.assertEqual(ledger.get(self.user).expenses, Decimal('50.5'))
+        self.assertEqual(rollups.verify(self.user), [])
+
+        # удаление расхода оставляет пополнение — без ссылки на транзакцию
+        bulk.delete(self.user, Transaction.objects.filter(id=expense.id))
+        self.assertEqual(self.goal.contributions.filter(transaction__isnull=True).count(), 3)
+
+    def test_progress_matches_relativedelta(self):
+        today = date(2026, 3, 31)
+        deadlines = [date(2026, 6, 30), date(2026, 6, 29), date(2026, 4, 30), date(2026, 4, 15),
+                     date(2027, 2, 28), date(2028, 2, 29), date(2026, 3, 31), date(2025, 12, 1)]
+        Goal.objects.bulk_create(
+            Goal(user=self.user, name=str(d), target_amount=900, current_amount=300, deadline=d) for d in deadlines
+        )
+        for goal in Goal.objects.with_progress(today).filter(user=self.user).exclude(id=self.goal.id):
+            diff = relativedelta(goal.deadline, today)
+            months = 0 if goal.deadline <= today else diff.years * 12 + diff.months or 1
+            self.assertEqual(goal.months_left, months, goal.deadline)
+            self.assertEqual(goal.progress_percent, 33.3)
+            self.assertAlmostEqual(goal.monthly_needed, 600 / (months or 1), places=2)
+
+    def test_list_queries_do_not_depend_on_goal_count(self):
+        url = reverse('main:goals_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        Goal.objects.bulk_create(
+            Goal(user=self.user, name=f'Цель {i}', target_amount=100, deadline=date(2027, 1, 1)) for i in range(20)
+        )
+        ledger.bump(self.user.id)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertContains(response, 'Цель 19')
+
+
+class CategorySummaryTests(TestCase):
+    """Разбивка по категориям: месячные итоги плюс края периода, top-N и «Прочие»."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('categories@example.com', password='secret')
+        Profile.objects.create(user=cls.user, timezone='UTC')
+        # две категории с одинаковым названием не должны сливаться
+        cls.categories = [
+            Category.objects.create(user=cls.user, name='Еда' if i < 2 else f'Категория {i}', type='expense')
+            for i in range(12)
+        ]
+        start = timezone.make_aware(timezone.datetime(2026, 1, 1, 12))
+        Transaction.objects.bulk_create(
+            Transaction(user=cls.user, type='expense', amount=i % 7 + 1, date=start + timedelta(days=i % 150),
+                        category=cls.categories[i % 13] if i % 13 < 12 else None)
+            for i in range(1000)
+        )
+        rollups.rebuild(cls.user)
+
+    def expected(self, start, end):
+        rows = (Transaction.objects.filter(user=self.user, local_date__range=(start, end))
+                .values('category_id').annotate(total=Sum('amount')))
+        return {row['category_id']: float(row['total']) for row in rows}
+
+    def test_matches_transactions_for_any_period(self):
+        periods = [(date(2026, 1, 15), date(2026, 4, 10)), (date(2026, 2, 1), date(2026, 3, 31)),
+                   (date(2026, 3, 5), date(2026, 3, 20)), (date(2025, 12, 1), date(2026, 12, 31))]
+        for start, end in periods:
+            result = dashboard._category_totals(
+                [row for rows in dashboard._category_rows(self.user, start, end) for row in rows], top=100,
+            )['expense']
+            self.assertEqual(dict(zip(result['ids'], result['totals'])), self.expected(start, end), (start, end))
+            self.assertEqual(result['labels'].count('Еда'), 2)
+
+    def test_top_and_other(self):
+        start, end = date(2025, 11, 1), date(2026, 10, 31)
+        version = ledger.get(self.user).version
+        with CaptureQueriesContext(connection) as captured:
+            result = dashboard.categories(self.user, start, end, version)['expense']
+        self.assertEqual(len(captured.captured_queries), 2)
+        self.assertEqual(len(result['labels']), dashboard.TOP_CATEGORIES + 1)
+        self.assertEqual((result['ids'][-1], result['labels'][-1]), (None, 'Прочие'))
+        self.assertAlmostEqual(sum(result['totals']), sum(self.expected(start, end).values()), places=2)
+        self.assertEqual(result['totals'][:-1], sorted(result['totals'][:-1], reverse=True))
+
+
+class MetricsTests(TransactionTestCase):
+    """PerformanceMiddleware считает SQL и под ASGI, где ORM работает в потоке sync_to_async."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('metrics@example.com', password='secret')
+        cache.clear()
+        metrics.reset()
+
+    def test_async_request_counts_queries(self):
+        async def get():
+            client = AsyncClient()
+            await client.aforce_login(self.user)
+            return await client.get(reverse('main:index'))
+
+        # свой цикл событий в отдельном потоке: запросы ORM уходят в общий поток sync_to_async,
+        # а не в поток, где работает middleware (как под uvicorn)
+        with ThreadPoolExecutor(1) as pool:
+            response = pool.submit(asyncio.run, get()).result()
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreater(queries, 0)
+        self.assertIn(f'mybudget_sql_queries_total{{view="main:index"}} {queries}', metrics.render())
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_sync_request_timing_and_metrics_endpoint(self):
+        client = Client()  # middleware читает SLOW_REQUEST_MS при создании
+        client.force_login(self.user)
+        with self.assertLogs('main.performance', 'WARNING') as logs:
+            response = client.get(reverse('main:transactions_list'))
+            metrics_status = client.get(reverse('main:metrics')).status_code
+            User.objects.filter(pk=self.user.pk).update(is_staff=True)
+            authcache.invalidate(self.user.id)
+            body = client.get(reverse('main:metrics')).content.decode()
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="[1-9]\d* queries", tpl;dur=')
+        self.assertIn('SELECT', logs.output[0])
+        self.assertEqual(metrics_status, 302)  # только для staff
+        self.assertIn('mybudget_request_duration_seconds_count{view="main:transactions_list"} 1', body)
+        self.assertIn('mybudget_request_duration_seconds_bucket{view="main:transactions_list",le="+Inf"} 1', body)
+
+
+class ImportTests(TestCase):
+    """Импорт выписки пачками: дубликатами считаются только транзакции, что были до импорта."""
+
+    CSV = ('date,amount,description\n2025-01-05,-120.50,Кофе\n2025-01-05,-120.50,Кофе\n'
+           '2025-01-06,5000,Зарплата\n2025-01-07,abc,Ошибка\n')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('import@example.com', password='secret')
+
+    def run_import(self, text):
+        return importers.import_transactions(self.user, importers.parse_csv(io.StringIO(text)), batch_size=1)
+
+    def test_identical_rows_in_one_file_are_kept(self):
+        stats = self.run_import(self.CSV)
+        self.assertEqual((stats['read'], stats['created'], stats['duplicates'], stats['errors']), (4, 3, 0, 1))
+        self.assertEqual(Transaction.objects.filter(user=self.user, description='Кофе').count(), 2)
+        self.assertEqual(ledger.get(self.user).expenses, Decimal('241.00'))
+        self.assertEqual(rollups.verify(self.user), [])
+
+        # повторный импорт той же выписки ничего не добавляет, третья такая же покупка — добавляет
+        stats = self.run_import(self.CSV)
+        self.assertEqual((stats['created'], stats['duplicates']), (0, 3))
+        stats = self.run_import(self.CSV.replace('2025-01-06,5000,Зарплата', '2025-01-05,-120.50,Кофе'))
+        self.assertEqual((stats['created'], stats['duplicates']), (1, 2))
+        self.assertEqual(Transaction.objects.filter(user=self.user, description='Кофе').count(), 3)
+
+
+class CaptchaPoolTests(TestCase):
+    """Пул капч пополняется только взамен выданных и не пересоздаёт невостребованные."""
+
+    def setUp(self):
+        from . import captchapool
+        self.pool = captchapool
+        while not captchapool._queue.empty():
+            captchapool._queue.get_nowait()
+        captchapool._wakeup.clear()
+        patcher = mock.patch.object(captchapool, '_ensure_worker')  # пополнение вызываем сами
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refill_only_after_take(self):
+        from captcha.models import CaptchaStore
+
+        key = self.pool.take()  # пул пуст — капча создаётся на месте
+        self.assertTrue(self.pool._wakeup.is_set())
+        self.assertTrue(self.pool.image(key).startswith(b'\x89PNG'))
+        self.pool.refill()
+        self.assertEqual(CaptchaStore.objects.count(), 1 + self.pool.POOL_SIZE)
+        self.pool.refill()  # капчу никто не брал — новых не создаётся
+        self.assertEqual(CaptchaStore.objects.count(), 1 + self.pool.POOL_SIZE)
+
+        self.pool._wakeup.clear()
+        pooled = self.pool.take()
+        self.assertTrue(self.pool._wakeup.is_set())
+        self.pool.refill()
+        self.assertEqual(CaptchaStore.objects.count(), 2 + self.pool.POOL_SIZE)
+
+        self.pool.discard(pooled)
+        self.assertFalse(CaptchaStore.objects.filter(hashkey=pooled).exists())
+        # истёкшие капчи из очереди не выдаются и не пересоздаются впрок
+        stale = [self.pool._queue.get_nowait()[0] for _ in range(self.pool._queue.qsize())]
+        for key in stale:
+            self.pool._queue.put_nowait((key, timezone.now()))
+        CaptchaStore.objects.update(expiration=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.pool.reap(), 1 + self.pool.POOL_SIZE)
+        self.assertNotIn(self.pool.take(), stale)
+        self.assertEqual(CaptchaStore.objects.count(), 1)
+
+    def test_registration_captcha_is_single_use(self):
+        from captcha.models import CaptchaStore
+
+        def captcha_key(response):
+            return re.search(r'name="captcha_0" value="(\w+)"', response.content.decode()).group(1)
+
+        key = captcha_key(self.client.get(reverse('main:register')))
+        image = self.client.get(reverse('main:captcha_image', args=[key]))
+        self.assertEqual((image.status_code, image['Content-Type']), (200, 'image/png'))
+        form = {'nickname': 'Новый', 'username': 'new@example.com', 'password': 'Длинный-пароль-42',
+                'captcha_0': key, 'captcha_1': 'неверно'}
+        self.assertContains(self.client.post(reverse('main:register'), form), 'Неверно введена капча')
+        self.assertEqual(self.client.get(reverse('main:captcha_image', args=[key])).status_code, 410)
+
+        key = captcha_key(self.client.get(reverse('main:register')))
+        answer = CaptchaStore.objects.get(hashkey=key).response
+        response = self.client.post(reverse('main:register'), {**form, 'captcha_0': key, 'captcha_1': answer})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertTrue(User.objects.filter(username='new@example.com').exists())
+        # повторная отправка с той же капчей не проходит
+        self.assertContains(self.client.post(reverse('main:register'), {**form, 'captcha_0': key, 'captcha_1': answer}),
+                            'Неверно введена капча')
+
+
+class LedgerTests(TestCase):
+    """Хранимый баланс и контрольные точки совпадают с пересчётом по транзакциям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # UTC+14 и UTC−11: в 05:00 UTC 1 марта у первого уже 1 марта, у второго ещё 28 февраля
+        cls.east = User.objects.create_user('east@example.com', password='secret')
+        cls.west = User.objects.create_user('west@example.com', password='secret')
+        Profile.objects.create(user=cls.east, timezone='Pacific/Kiritimati')
+        Profile.objects.create(user=cls.west, timezone='Pacific/Pago_Pago')
+        cls.now = datetime(2026, 3, 1, 5, tzinfo=dt_timezone.utc)
+        for user in (cls.east, cls.west):
+            for i in range(6):
+                tx = Transaction.objects.create(user=user, type='income' if i % 2 else 'expense', amount=10 * (i + 1),
+                                                date=cls.now - timedelta(hours=12 * i))
+                rollups.apply(tx)
+
+    def test_checkpoints_follow_user_days(self):
+        with mock.patch('django.utils.timezone.now', return_value=self.now):
+            call_command('checkpoint_balances', stdout=io.StringIO())
+        for user, day in ((self.east, date(2026, 2, 28)), (self.west, date(2026, 2, 27))):
+            point = LedgerCheckpoint.objects.get(user=user)
+            self.assertEqual(point.day, day)
+            self.assertEqual(point.balance, ledger.recompute(user.id, day)['balance'])
+
+        # транзакция задним числом сдвигает точку тем же UPDATE, что и Ledger
+        tx = Transaction.objects.create(user=self.east, type='expense', amount=7, date=self.now - timedelta(days=10))
+        rollups.apply(tx)
+        self.assertEqual(LedgerCheckpoint.objects.get(user=self.east).balance,
+                         ledger.recompute(self.east.id, date(2026, 2, 28))['balance'])
+        self.assertEqual(ledger.get(self.east).balance, ledger.recompute(self.east.id)['balance'])
+        self.assertEqual(ledger.balance_on(self.east, date(2026, 2, 25)),
+                         ledger.recompute(self.east.id, date(2026, 2, 25))['balance'])
+
+
+class TimeSeriesTests(TestCase):
+    """График доходов и расходов: все корзины одним запросом, суммы — как по транзакциям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('series@example.com', password='secret')
+        now = timezone.now()
+        Transaction.objects.bulk_create(
+            Transaction(user=cls.user, type='income' if i % 4 == 0 else 'expense', amount=i % 90 + 1,
+                        date=now - timedelta(days=i % 120, hours=i % 24))
+            for i in range(400)
+        )
+        rollups.rebuild(cls.user)
+
+    def test_buckets_match_transactions(self):
+        end = timezone.localdate()
+        start = end - timedelta(days=99)
+        rows = Transaction.objects.filter(user=self.user, local_date__range=(start, end))
+        for step in ('day', 'week', 'month'):
+            with self.subTest(step=step), CaptureQueriesContext(connection) as queries:
+                series = timeseries.income_expense_series(self.user, start, end, step)
+                self.assertEqual(len(queries.captured_queries), 1)
+                expected = {}
+                for tx in rows:
+                    bucket = expected.setdefault(timeseries.bucket_start(tx.local_date, step), {'income': 0, 'expense': 0})
+                    bucket[tx.type] += tx.amount
+                self.assertEqual(len(series['labels']), len(series['dates']))
+                self.assertEqual(series['dates'][0], timeseries.bucket_start(start, step))
+                for day, income, expense in zip(series['dates'], series['income'], series['expense']):
+                    totals = expected.get(day, {'income': 0, 'expense': 0})
+                    self.assertEqual((cents(income), cents(expense)), (cents(totals['income']), cents(totals['expense'])))
+
+
+class RollupTests(TestCase):
+    """Дневные и месячные итоги и баланс сдвигаются дельтами при добавлении, правке и удалении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rollups@example.com', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Еда', type='expense')
+        cls.cafe = Category.objects.create(user=cls.user, name='Кафе', type='expense')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertConsistent(self):
+        self.assertEqual(rollups.verify(self.user), [])
+        self.assertEqual(ledger.get(self.user).balance, ledger.recompute(self.user.id)['balance'])
+
+    def test_views_keep_rollups_in_sync(self):
+        for day, amount in (('2026-01-31', '100'), ('2026-02-01', '40.50'), ('2026-02-01', '9.50')):
+            self.client.post(reverse('main:transaction_add', args=['expense']),
+                             {'amount': amount, 'category': self.food.id, 'date': day, 'time': '12:00'})
+        self.client.post(reverse('main:transaction_add', args=['income']),
+                         {'amount': '500', 'date': '2026-02-02', 'time': '09:00'})
+        self.assertConsistent()
+        self.assertEqual(ledger.get(self.user).balance, Decimal('350.00'))
+        february = MonthlyRollup.objects.get(user=self.user, month=date(2026, 2, 1), type='expense', category=self.food)
+        self.assertEqual((february.total, february.count), (Decimal('50.00'), 2))
+
+        # правка переносит сумму в другой день, месяц и категорию
+        tx = Transaction.objects.get(user=self.user, amount=100)
+        self.client.post(reverse('main:transaction_edit', args=[tx.id]), {
+            'amount': '120', 'category': self.cafe.id, 'description': '', 'date': '2026-02-03', 'time': '12:00',
+        })
+        self.assertConsistent()
+        self.assertFalse(DailyRollup.objects.filter(user=self.user, day=date(2026, 1, 31), count__gt=0).exists())
+
+        self.client.post(reverse('main:transaction_delete', args=[tx.id]))
+        self.assertConsistent()
+        self.assertEqual(ledger.get(self.user).balance, Decimal('450.00'))
+
+        # пересборка с нуля даёт те же итоги
+        out = io.StringIO()
+        call_command('rebuild_rollups', check=True, stdout=out)
+        self.assertIn('сходятся', out.getvalue())
+
+
+class PaginationTests(TestCase):
+    """Страницы по курсору: без пропусков и повторов при любой сортировке, в том числе при равных значениях."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pages@example.com', password='secret')
+        now = timezone.now().replace(microsecond=0)
+        Transaction.objects.bulk_create(
+            # повторяющиеся суммы, типы и моменты времени: порядок внутри равных задаёт id
+            Transaction(user=cls.user, type='income' if i % 3 == 0 else 'expense', amount=i % 7 + 1,
+                        date=now - timedelta(hours=i // 2))
+            for i in range(130)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_pages_cover_list_once(self):
+        for sort in ('date', '-date', 'amount', '-amount', 'type', '-type'):
+            with self.subTest(sort=sort):
+                expected = list(Transaction.objects.filter(user=self.user)
+                                .order_by(sort, ('-' if sort.startswith('-') else '') + 'id')
+                                .values_list('id', flat=True))
+                seen, cursor = [], None
+                while True:
+                    params = {'sort': sort, **({'cursor': cursor} if cursor else {})}
+                    response = self.client.get(reverse('main:transactions_list'), params)
+                    page = [tx.id for tx in response.context['transactions']]
+                    self.assertLessEqual(len(page), pagination.PAGE_SIZE)
+                    seen += page
+                    cursor = response.context['next_cursor']
+                    if not cursor:
+                        break
+                self.assertEqual(seen, expected)
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('main:transactions_list'), {'sort': 'amount', 'cursor': 'не-курсор'})
+        first = self.client.get(reverse('main:transactions_list'), {'sort': 'amount'})
+        self.assertEqual([tx.id for tx in response.context['transactions']],
+                         [tx.id for tx in first.context['transactions']])
+
+
+class ExportTests(TestCase):
+    """Выгрузка потоком: те же строки и порядок, что в списке, и файл читается импортом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('export@example.com', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Еда', type='expense')
+        now = timezone.now().replace(microsecond=0)
+        Transaction.objects.bulk_create(
+            Transaction(user=cls.user, type='income' if i % 4 == 0 else 'expense', amount=Decimal(i) + Decimal('0.25'),
+                        category=cls.food if i % 4 else None, description=f'Строка, "{i}"', date=now - timedelta(hours=i))
+            for i in range(1, 41)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('main:transactions_export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_round_trip(self):
+        text = self.export(format='csv', sort='-amount')
+        self.assertTrue(text.startswith('\ufeffdate,amount,type,category,description'))
+        amounts = [Decimal(line.split(',')[1]) for line in text.splitlines()[1:]]
+        self.assertEqual(amounts, sorted(amounts, reverse=True))
+
+        other = User.objects.create_user('copy@example.com', password='secret')
+        stats = importers.import_transactions(other, importers.parse_csv(io.StringIO(text.lstrip('\ufeff'))))
+        self.assertEqual((stats['created'], stats['errors']), (40, 0))
+        self.assertEqual(ledger.get(other).balance, ledger.get(self.user).balance)
+        self.assertEqual(Transaction.objects.filter(user=other, category__name='Еда').count(), 30)
+
+    def test_ndjson_filtered_by_category(self):
+        rows = [json.loads(line) for line in self.export(format='ndjson', category=self.food.id).splitlines()]
+        self.assertEqual(len(rows), 30)
+        self.assertEqual({row['category'] for row in rows}, {'Еда'})
+        self.assertEqual(rows[0]['amount'], '1.25')
+
+
+class DataCacheTests(TestCase):
+    """Данные графиков кэшируются по версии данных пользователя и пересчитываются после записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cache@example.com', password='secret')
+        cls.other = User.objects.create_user('cache-other@example.com', password='secret')
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, user, amount):
+        tx = Transaction.objects.create(user=user, type='expense', amount=amount)
+        rollups.apply(tx)
+
+    def test_version_invalidates(self):
+        self.add(self.user, 10)
+        today = usertz.local_date(self.user.id, timezone.now())
+        first = dashboard.categories(self.user, today, today)
+        self.assertEqual(first['expense']['totals'], [10.0])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(dashboard.categories(self.user, today, today), first)
+        # только чтение версии из Ledger
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        self.add(self.other, 99)  # чужие изменения кэш пользователя не сбрасывают
+        with CaptureQueriesContext(connection) as queries:
+            dashboard.categories(self.user, today, today)
+        self.assertEqual(len(queries.captured_queries), 1)
+
+        self.add(self.user, 5)
+        self.assertEqual(dashboard.categories(self.user, today, today)['expense']['totals'], [15.0])
+        stats = datacache.stats()
+        self.assertGreaterEqual(stats['hits'], 2)
+
+
+class ChartApiTests(TestCase):
+    """JSON графиков: ETag по версии данных, 304 без агрегации, новый ETag после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('charts@example.com', password='secret')
+        cls.other = User.objects.create_user('charts-other@example.com', password='secret')
+        rollups.apply(Transaction.objects.create(user=cls.user, type='income', amount=300))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_conditional_get(self):
+        url = reverse('main:chart_summary') + '?period=30'
+        response = self.client.get(url)
+        self.assertEqual(response.json()['total']['balance'], 300.0)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries.captured_queries if 'rollup' in q['sql']])
+        self.assertNotEqual(self.client.get(reverse('main:chart_summary') + '?period=7')['ETag'], etag)
+
+        rollups.apply(Transaction.objects.create(user=self.user, type='expense', amount=100))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total']['balance'], 200.0)
+
+        # чужой ETag не подходит: в нём другой пользователь
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class BenchmarkTests(TestCase):
+    """seed_data воспроизводим по зерну, benchmark замеряет страницы и находит регрессии."""
+
+    def seed(self):
+        call_command('seed_data', users=1, transactions=300, goals=2, days=90, prefix='seed', stdout=io.StringIO())
+        user = User.objects.get(username='seed-1@example.com')
+        return user, list(Transaction.objects.filter(user=user).order_by('date', 'id')
+                          .values_list('amount', 'type', 'category__name', 'description'))
+
+    def test_seed_and_benchmark(self):
+        user, first = self.seed()
+        user, second = self.seed()
+        self.assertGreaterEqual(len(first), 300)  # и зарплаты дважды в месяц
+        self.assertEqual(first, second)
+        self.assertEqual(rollups.verify(user), [])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('benchmark', user='seed-1@example.com', runs=1, output=output, stdout=io.StringIO())
+            results = benchmark.read_results(output)
+        self.assertIn('transactions sort=-date', results)
+        self.assertEqual(results['transaction_add']['runs'], 1)
+        self.assertFalse(Transaction.objects.filter(description='benchmark').exists())
+
+        slower = {name: {**r, 'p95_ms': r['p95_ms'] * 2 + 1, 'queries': r['queries'] + 1} for name, r in results.items()}
+        self.assertEqual(benchmark.compare(results, results, 0.2), [])
+        self.assertEqual(len(benchmark.compare(slower, results, 0.2)), 2 * len(results))
+
+
+class SQLiteConcurrencyTests(TransactionTestCase):
+    """SQLite в WAL с BEGIN IMMEDIATE: параллельные записи ждут блокировку, а не падают с «database is locked»."""
+
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            values = {}
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'temp_store'):
+                cursor.execute(f'PRAGMA {pragma}')
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2})
+
+    def test_parallel_writers(self):
+        user = User.objects.create_user('writers@example.com', password='secret')
+
+        def write(n):
+            try:
+                for i in range(20):
+                    with db_transaction.atomic():
+                        rollups.apply(Transaction.objects.create(user=user, type='expense', amount=n + i))
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(write, range(4)))
+        self.assertEqual(Transaction.objects.filter(user=user).count(), 80)
+        self.assertEqual(rollups.verify(user), [])
+        self.assertEqual(ledger.get(user).balance, ledger.recompute(user.id)['balance'])
+
+    def test_stress_db_fails_when_worker_dies(self):
+        User.objects.create_user('bench-1@example.com', password='secret')
+        crash = mock.patch('main.management.commands.stress_db._worker', side_effect=SystemExit(3))
+        with crash, self.assertRaisesMessage(CommandError, '#0: 3'):
+            call_command('stress_db', workers=1, seconds=0, stdout=io.StringIO())
+
+
+class AsyncViewTests(TestCase):
+    """index_async и reports_async отдают те же данные, что синхронные страницы и JSON API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('async@example.com', password='secret')
+        food = Category.objects.create(user=cls.user, name='Еда', type='expense')
+        now = timezone.now()
+        for i in range(30):
+            rollups.apply(Transaction.objects.create(
+                user=cls.user, type='income' if i % 5 == 0 else 'expense', amount=i + 1,
+                category=None if i % 5 == 0 else food, date=now - timedelta(days=i),
+            ))
+
+    def setUp(self):
+        cache.clear()
+
+    def request(self, path):
+        request = AsyncRequestFactory().get(path)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        return request
+
+    async def test_reports_async_embeds_chart_data(self):
+        # зону пользователя (по умолчанию — DEFAULT_USER_TIME_ZONE) обычно включает TimezoneMiddleware
+        with timezone.override(settings.DEFAULT_USER_TIME_ZONE):
+            response = await views.reports_async(self.request('/reports/?period=30'))
+        self.assertEqual(response.status_code, 200)
+        embedded = json.loads(re.search(
+            r'<script id="initialCharts" type="application/json">(.*?)</script>', response.content.decode(), re.S,
+        ).group(1))
+
+        await self.async_client.aforce_login(self.user)
+        for name in ('series', 'categories'):
+            api = await self.async_client.get(reverse(f'main:chart_{name}'), {'period': 30})
+            self.assertEqual(embedded[name], api.json(), name)
+        summary = await self.async_client.get(reverse('main:chart_summary'), {'period': 30})
+        self.assertEqual(embedded['summary']['period'], summary.json()['period'])
+
+    async def test_index_async_shows_balance(self):
+        totals = await ledger.aget(self.user)
+        response = await views.index_async(self.request('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, formats.number_format(totals.balance, 2))
+        self.assertContains(response, 'Еда')
+
+
+class StaticAssetTests(TestCase):
+    """collectstatic кладёт файлы с хэшем в имени и сжатые копии; static_file выбирает копию по Accept-Encoding."""
+
+    def test_hashed_precompressed_files(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            source = 'main/vendor/bootstrap-5.3.8/bootstrap.min.css'
+            hashed = staticfiles_storage.stored_name(source)
+            self.assertRegex(hashed, assets.HASHED_NAME)
+            self.assertEqual(static(source), settings.STATIC_URL + hashed)
+            with open(finders.find(source), 'rb') as f:
+                original = f.read()
+
+            response = self.client.get(static(source), HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual((response['Content-Encoding'], response['Cache-Control']), ('gzip', assets.IMMUTABLE))
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), original)
+
+            response = self.client.get(static(source))
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual(b''.join(response.streaming_content), original)
+
+            # имя без хэша может смениться содержимым — его браузер перепроверяет
+            response = self.client.get(settings.STATIC_URL + source)
+            self.assertEqual(response['Cache-Control'], 'no-cache')
+            # выход за STATIC_ROOT: не найдено или отклонено как подозрительный путь
+            self.assertIn(self.client.get(settings.STATIC_URL + '../manage.py').status_code, (400, 404))
+
+
+class WorkerStartupTests(TestCase):
+    """Воркер не импортирует капчу и Pillow при старте; профиль gunicorn читает переопределения из окружения."""
+
+    def test_urlconf_does_not_load_captcha(self):
+        script = (
+            'import json, sys\n'
+            'from django.core.wsgi import get_wsgi_application\n'
+            'get_wsgi_application()\n'
+            'from django.urls import get_resolver\n'
+            'get_resolver().url_patterns\n'
+            "print(json.dumps(sorted(m for m in ('PIL', 'captcha.views') if m in sys.modules)))\n"
+        )
+        process = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'MyBudget.settings'},
+        )
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(json.loads(process.stdout.splitlines()[-1]), [])
+
+    def test_gunicorn_profile(self):
+        path = os.path.join(settings.BASE_DIR, 'gunicorn.conf.py')
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKERS': '3', 'GUNICORN_PRELOAD_APP': 'no'}):
+            config = runpy.run_path(path)
+        self.assertEqual((config['workers'], config['preload_app'], config['worker_class']), (3, False, 'gthread'))
+        config = runpy.run_path(path)
+        self.assertTrue(config['preload_app'])
+        self.assertGreater(config['max_requests'], config['max_requests_jitter'])
+
+
+@jobs.handler('test_sleep')
+def _sleep_job(job):
+    start = time.time()
+    time.sleep(job.params['seconds'])
+    return {'pid': os.getpid(), 'start': start, 'end': time.time()}
+
+
+class JobTests(TransactionTestCase):
+    """run_jobs выполняет задачи параллельно в процессах пула (тестовая БД — файл, её видят процессы)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('jobs@example.com', password='secret')
+
+    def run_jobs(self, workers):
+        call_command('run_jobs', workers=workers, once=True, stdout=io.StringIO())
+
+    def test_jobs_run_in_parallel(self):
+        ids = [jobs.enqueue('test_sleep', self.user, seconds=1).id for _ in range(4)]
+        self.run_jobs(workers=4)
+        done = list(Job.objects.filter(id__in=ids))
+        self.assertEqual({job.status for job in done}, {'done'})
+        results = [job.result for job in done]
+        self.assertEqual(len({r['pid'] for r in results}), 4)
+        # каждая задача началась раньше, чем закончилась любая другая
+        self.assertLess(max(r['start'] for r in results), min(r['end'] for r in results))
+
+    def test_import_through_queue(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('bank.csv', 'date,amount,description\n2025-01-05,-120.50,Кофе\n'.encode())
+        response = self.client.post(reverse('main:transaction_import'), {'file': upload})
+        job = Job.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('main:job_detail', args=[job.id]))
+        status_url = reverse('main:job_status', args=[job.id])
+        self.assertEqual(self.client.get(status_url).json()['status'], 'queued')
+
+        self.run_jobs(workers=2)
+        status = self.client.get(status_url).json()
+        self.assertEqual((status['status'], status['progress'], status['result']['created']), ('done', 100, 1))
+        self.assertEqual(Transaction.objects.get(user=self.user).amount, Decimal('120.50'))
+        self.assertEqual(rollups.verify(self.user), [])
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import DailyRollup
+
+
+# шаг группировки -> (функция усечения дня, шаг между соседними точками)
+STEPS = {
+    'day': (F, relativedelta(days=1)),
+    'week': (TruncWeek, relativedelta(weeks=1)),
+    'month': (TruncMonth, relativedelta(months=1)),
+}
+
+LABEL_FORMATS = {
+    'day': '%d.%m',
+    'week': '%d.%m',
+    'month': '%m.%Y',
+}
+
+
+def bucket_start(day, step):
+    """Первый день корзины (день / неделя с понедельника / месяц), в которую попадает day."""
+    if step == 'week':
+        return day - timedelta(days=day.weekday())
+    if step == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _series_rows(user, start, end, step):
+    trunc, _ = STEPS[step]
+    return (
+        DailyRollup.objects
+        .filter(user=user, day__range=(start, end))
+        .annotate(bucket=trunc('day'))
+        .values('bucket')
+        .annotate(
+            income=Sum('total', filter=Q(type='income')),
+            expense=Sum('total', filter=Q(type='expense')),
+        )
+        .order_by('bucket')
+    )
+
+
+def _fill(rows, start, end, step):
+    totals = {row['bucket']: row for row in rows}
+    delta = STEPS[step][1]
+
+    dates, income, expense = [], [], []
+    bucket = bucket_start(start, step)
+    while bucket <= end:
+        row = totals.get(bucket, {})
+        dates.append(bucket)
+        income.append(row.get('income') or 0)
+        expense.append(row.get('expense') or 0)
+        bucket += delta
+
+    return {
+        'dates': dates,
+        'labels': [d.strftime(LABEL_FORMATS[step]) for d in dates],
+        'income': income,
+        'expense': expense,
+    }
+
+
+def income_expense_series(user, start, end, step='day'):
+    """Доходы и расходы пользователя за [start, end] с разбивкой по дням, неделям или месяцам.
+
+    Все корзины считаются одним GROUP BY запросом по дневным итогам (DailyRollup),
+    пустые периоды заполняются нулями, поэтому стоимость не зависит от длины периода.
+    Возвращает словарь со списками dates, labels, income и expense одинаковой длины.
+    """
+    return _fill(list(_series_rows(user, start, end, step)), start, end, step)
+
+
+async def aincome_expense_series(user, start, end, step='day'):
+    """Асинхронный income_expense_series (для async-представлений)."""
+    return _fill([row async for row in _series_rows(user, start, end, step)], start, end, step)
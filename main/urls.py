@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,12 +6,14 @@ app_name = 'main'
 
 urlpatterns = [
     # main
-    path('', views.index, name='index'),
+    path('', views.index_async if settings.ASYNC_VIEWS else views.index, name='index'),
 
     # authentication
     path('login/', views.user_login, name='login'),
     path('register/', views.user_register, name='register'),
     path('logout/', views.user_logout, name='logout'),
+    path('register/captcha/<str:key>.png', views.captcha_image, name='captcha_image'),
+    path('profile/', views.profile_edit, name='profile'),
 
     # goals
     path('goals/', views.goals_list, name='goals_list'),
@@ -20,17 +23,32 @@ urlpatterns = [
     path('goals/<int:goal_id>/delete/', views.goal_delete, name='goal_delete'),
 
     # reports
-    path('reports/', views.reports, name='reports'),
+    path('reports/', views.reports_async if settings.ASYNC_VIEWS else views.reports, name='reports'),
+    path('api/charts/series/', views.chart_series, name='chart_series'),
+    path('api/charts/categories/', views.chart_categories, name='chart_categories'),
+    path('api/charts/summary/', views.chart_summary, name='chart_summary'),
+    path('api/charts/forecast/', views.chart_forecast, name='chart_forecast'),
+    path('stats/cache/', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics_view, name='metrics'),
 
     # categories
     path('categories/', views.categories_list, name='categories_list'),
     path('categories/add/', views.category_add, name='category_add'),
     path('categories/<int:pk>/edit/', views.category_edit, name='category_edit'),
+    path('categories/<int:pk>/merge/', views.category_merge, name='category_merge'),
     path('categories/<int:pk>/delete/', views.category_delete, name='category_delete'),
 
     # transactions
     path('transactions/', views.transactions_list, name='transactions_list'),
     path('transactions/add/<str:type>/', views.transaction_add, name='transaction_add'),
+    path('transactions/import/', views.transaction_import, name='transaction_import'),
+    path('transactions/export/', views.transactions_export, name='transactions_export'),
+    path('transactions/bulk/', views.transactions_bulk, name='transactions_bulk'),
     path('transactions/edit/<int:pk>/', views.transaction_edit, name='transaction_edit'),
     path('transactions/delete/<int:pk>/', views.transaction_delete, name='transaction_delete'),
+
+    # background jobs
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
 ]
@@ -0,0 +1,102 @@
+"""Временная зона пользователя и локальная дата транзакций.
+
+Зона хранится в Profile.timezone (по умолчанию DEFAULT_USER_TIME_ZONE). Транзакция при
+сохранении получает local_date — дату в зоне своего пользователя, и все разбивки по дням,
+неделям и месяцам (DailyRollup, MonthlyRollup, Ledger) идут по этой колонке: обычный
+диапазон по индексу вместо функции над date, и дни совпадают с календарём пользователя.
+
+Для запросов (отображение, «сегодня») зона читается из Profile не чаще раза в
+USER_CACHE_SECONDS на процесс; сохранение профиля сбрасывает запись этого процесса (как в
+main/authcache.py). local_date же записывается навсегда, поэтому сохранение транзакций и
+пересчёт после смены зоны читают Profile напрямую (stored_zone): другие воркеры и процессы
+задач могут ещё держать в кэше прежнюю зону.
+"""
+import threading
+import time
+import zoneinfo
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import ledger, rollups
+from .models import LedgerCheckpoint, Profile, Transaction
+
+BATCH_SIZE = 5000
+
+_lock = threading.Lock()
+_names = {}
+
+
+def default_name():
+    return settings.DEFAULT_USER_TIME_ZONE
+
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    return zoneinfo.ZoneInfo(name)
+
+
+@lru_cache(maxsize=1)
+def choices():
+    """Имена зон для выбора в профиле."""
+    return tuple(sorted(zoneinfo.available_timezones()))
+
+
+def zone(user_id):
+    """Временная зона пользователя (ZoneInfo)."""
+    entry = _names.get(user_id)
+    if entry is None or entry[0] <= time.monotonic():
+        name = Profile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+        entry = (time.monotonic() + getattr(settings, 'USER_CACHE_SECONDS', 30), name or default_name())
+        with _lock:
+            _names[user_id] = entry
+    return _zone(entry[1])
+
+
+def stored_zone(user_id):
+    """Зона пользователя прямо из Profile, мимо кэша процесса (для записи local_date)."""
+    name = Profile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+    return _zone(name or default_name())
+
+
+def local_date(user_id, moment):
+    """Дата момента moment в текущей зоне пользователя (из Profile, см. stored_zone)."""
+    return timezone.localdate(moment, stored_zone(user_id))
+
+
+def localize(transactions):
+    """Проставляет local_date транзакциям (bulk_create, где save не вызывается)."""
+    zones = {user_id: stored_zone(user_id) for user_id in {tx.user_id for tx in transactions}}
+    for tx in transactions:
+        tx.local_date = timezone.localdate(tx.date, zones[tx.user_id])
+    return transactions
+
+
+def relocalize(user):
+    """После смены зоны: пересчитывает local_date всех транзакций пользователя, итоги и контрольные точки."""
+    zone_ = stored_zone(user.id)
+    rows = Transaction.objects.filter(user=user).values_list('id', 'date', 'local_date').iterator(BATCH_SIZE)
+    # список целиком до UPDATE: выборка может идти по индексу (user, local_date), который он меняет
+    changed = [(day, pk) for pk, moment, old in rows if (day := timezone.localdate(moment, zone_)) != old]
+    with transaction.atomic():
+        # executemany простого UPDATE по id быстрее bulk_update, который строит CASE на каждую строку
+        with connection.cursor() as cursor:
+            cursor.executemany(f'UPDATE {Transaction._meta.db_table} SET local_date = %s WHERE id = %s', changed)
+        rollups.rebuild(user)
+        for point in LedgerCheckpoint.objects.filter(user=user):
+            point.balance = ledger.recompute(user.id, point.day)['balance']
+            point.save(update_fields=['balance'])
+
+
+def invalidate(user_id):
+    with _lock:
+        _names.pop(user_id, None)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def _profile_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
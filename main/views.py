@@ -2,63 +2,85 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.utils import timezone
-from .models import Goal
+from .models import Goal, GoalContribution, Job, Profile
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum
-from .models import Transaction, Category
-from datetime import date, datetime, timedelta
+from django.db import transaction as db_transaction
+from django.db.models import F, Q, Sum
+from .models import Transaction, Category, DailyRollup
+from .pagination import keyset_page
+from .timeseries import STEPS
+from . import analytics, assets, bulk, dashboard, datacache, exporters, importers, jobs, ledger, metrics, rollups, search, usertz
+from datetime import datetime, timedelta
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.urls import reverse
 from decimal import Decimal, InvalidOperation
-import time
-from captcha.models import CaptchaStore
-from captcha.helpers import captcha_image_url
+import asyncio
+import hashlib
+import uuid
+from urllib.parse import urlencode
 from django.core.validators import validate_email
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 
 
 
+def _totals(rollup_rows):
+    """Доходы и расходы по набору строк DailyRollup одним запросом."""
+    totals = rollup_rows.aggregate(
+        income=Sum('total', filter=Q(type='income')),
+        expenses=Sum('total', filter=Q(type='expense')),
+    )
+    return totals['income'] or 0, totals['expenses'] or 0
+
+
 @login_required
 def index(request):
     user = request.user
 
-    # Доходы и расходы для прогресс-бара
-    income = Transaction.objects.filter(user=user, type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-    expenses = Transaction.objects.filter(user=user, type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-    balance = income - expenses
+    # Доходы, расходы и баланс — одна строка Ledger, а не вся история
+    totals = ledger.get(user)
+
+    # Остальное берётся из кэша по версии данных пользователя (она лежит в той же строке Ledger)
+    # Последние 10 транзакций
+    transactions = dashboard.recent_transactions(user, totals.version)
+
+    # выборка целей
+    goals = dashboard.goals_preview(user, totals.version)
+
+    # бюджеты категорий за текущий месяц — из месячных итогов
+    budgets = dashboard.budgets(user, totals.version)
+
+    # Мини-график за неделю страница забирает сама из chart_series
+
+    return render(request, 'main/index.html', _index_context(totals, transactions, goals, budgets))
+
+
+@login_required
+async def index_async(request):
+    """index для ASGI: последние транзакции и цели запрашиваются одновременно."""
+    user = await request.auser()
+    request.user = user  # шаблонам (context processor auth) нужен уже загруженный пользователь
+    totals = await ledger.aget(user)
+    transactions, goals, budgets = await asyncio.gather(
+        dashboard.arecent_transactions(user, totals.version),
+        dashboard.agoals_preview(user, totals.version),
+        dashboard.abudgets(user, totals.version),
+    )
+    return render(request, 'main/index.html', _index_context(totals, transactions, goals, budgets))
+
+
+def _index_context(totals, transactions, goals, budgets):
+    income, expenses, balance = totals.income, totals.expenses, totals.balance
 
     total = income + expenses
     income_percent = round(income / total * 100, 1) if total else 0
     expense_percent = round(expenses / total * 100, 1) if total else 0
 
-    # Последние 10 транзакций
-    transactions = Transaction.objects.filter(user=user).order_by('-date')[:10]
-
-    # выборка целей
-    goals = Goal.objects.filter(user=user).order_by('deadline')[:5]
-
-    # --- Данные для мини-графика доходов/расходов за неделю ---
-    today = date.today()
-    week_ago = today - timedelta(days=6)  # последние 7 дней включая сегодня
-    last_week_dates = [(week_ago + timedelta(days=i)) for i in range(7)]
-    labels = [d.strftime('%d.%m') for d in last_week_dates]
-
-    income_data = []
-    expense_data = []
-    for d in last_week_dates:
-        start_of_day = timezone.make_aware(datetime.combine(d, datetime.min.time()))
-        end_of_day = timezone.make_aware(datetime.combine(d, datetime.max.time()))
-        day_income = \
-        Transaction.objects.filter(user=user, type='income', date__range=(start_of_day, end_of_day)).aggregate(
-            Sum('amount'))['amount__sum'] or 0
-        day_expense = \
-        Transaction.objects.filter(user=user, type='expense', date__range=(start_of_day, end_of_day)).aggregate(
-            Sum('amount'))['amount__sum'] or 0
-        income_data.append(day_income)
-        expense_data.append(day_expense)
-
-    return render(request, 'main/index.html', {
+    return {
         'balance': balance,
         'income': income,
         'expenses': expenses,
@@ -66,13 +88,15 @@ def index(request):
         'expense_percent': expense_percent,
         'transactions': transactions,
         'goals': goals,
-        'week_labels': labels,
-        'week_income_data': [float(x) for x in income_data],
-        'week_expense_data': [float(x) for x in expense_data],
-    })
+        'budgets': budgets,
+    }
 
 
 def user_register(request):
+    # капча (и Pillow через неё) нужна только здесь — импорт при первом запросе, а не при старте воркера
+    from . import captchapool
+    from captcha.models import CaptchaStore
+
     if request.method == 'POST':
         nickname = request.POST.get('nickname')
         username = request.POST.get('username')
@@ -82,7 +106,8 @@ def user_register(request):
 
         # --- Проверка капчи ---
         try:
-            captcha = CaptchaStore.objects.get(hashkey=captcha_key)
+            captcha = CaptchaStore.objects.get(hashkey=captcha_key, expiration__gt=timezone.now())
+            captchapool.discard(captcha_key)  # капча одноразовая, даже при неверном ответе
             if captcha.response != captcha_value.lower():
                 raise Exception
         except Exception:
@@ -119,8 +144,11 @@ def user_register(request):
 
 # 👇 Вспомогательная функция, чтобы не копировать капчу 100 раз
 def _render_with_captcha(request, error=None):
-    new_key = CaptchaStore.generate_key()
-    new_image = captcha_image_url(new_key)
+    from . import captchapool
+
+    # капча и её картинка готовятся заранее в фоне (captchapool)
+    new_key = captchapool.take()
+    new_image = reverse('main:captcha_image', args=[new_key])
     return render(request, 'main/auth/register.html', {
         'error': error,
         'captcha': (
@@ -131,6 +159,18 @@ def _render_with_captcha(request, error=None):
     })
 
 
+def captcha_image(request, key):
+    from . import captchapool
+
+    png = captchapool.image(key)
+    if png is None:
+        # 410, чтобы поисковики не индексировали просроченные картинки
+        return HttpResponse(status=410)
+    response = HttpResponse(png, content_type='image/png')
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
 def user_login(request):
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -149,18 +189,41 @@ def user_logout(request):
     return redirect('main:login')
 
 
+@login_required
+def profile_edit(request):
+    profile, _ = Profile.objects.get_or_create(user=request.user)
+    if request.method == 'POST':
+        name = request.POST.get('timezone', '')
+        if name not in usertz.choices():
+            messages.error(request, 'Неизвестный часовой пояс.')
+        elif name != profile.timezone:
+            profile.timezone = name
+            profile.save()
+            # даты всех транзакций и итоги по дням пересчитываются в фоне
+            job = jobs.enqueue('relocalize', request.user)
+            messages.success(request, 'Часовой пояс сохранён, итоги пересчитываются.')
+            return redirect('main:job_detail', job.id)
+        else:
+            return redirect('main:index')
+    return render(request, 'main/profile/edit.html', {'profile': profile, 'timezones': usertz.choices()})
+
+
 @login_required
 def goals_list(request):
-    goals = Goal.objects.filter(user=request.user)
-    return render(request, 'main/goals/list.html', {'goals': goals})
+    # прогресс, остаток и срок в месяцах считаются в том же запросе (Goal.objects.with_progress)
+    goals = list(Goal.objects.with_progress().filter(user=request.user))
+    # реальный срок каждой цели при нынешнем темпе накоплений (main/analytics.py)
+    totals = ledger.get(request.user)
+    forecast = analytics.forecast(request.user, timezone.localdate(), totals.balance, totals.version)['goals']
+    for goal in goals:
+        goal.forecast = forecast['by_goal'].get(goal.id)
+    return render(request, 'main/goals/list.html', {'goals': goals, 'saving_rate': forecast['saving_rate']})
 
 
 @login_required
 def goal_add(request):
-    # текущая дата + 1 месяц (30 дней)
-    now_struct = time.localtime()
-    today_date = datetime.fromtimestamp(time.mktime(now_struct)).date()
-    default_deadline = today_date + timedelta(days=30)
+    # текущая дата (в зоне пользователя) + 1 месяц (30 дней)
+    default_deadline = timezone.localdate() + timedelta(days=30)
 
     if request.method == 'POST':
         name = request.POST.get('name')
@@ -185,6 +248,7 @@ def goal_add(request):
                     deadline=deadline,
                     created_at=timezone.now()
                 )
+                ledger.bump(request.user.id)
                 messages.success(request, "Цель успешно добавлена!")
                 return redirect('main:goals_list')
 
@@ -196,6 +260,7 @@ def goal_add(request):
 @login_required
 def add_to_goal(request, goal_id):
     goal = get_object_or_404(Goal, id=goal_id, user=request.user)
+    categories = Category.objects.filter(user=request.user, type='expense')
 
     if request.method == 'POST':
         amount_str = request.POST.get('amount', '0')
@@ -204,14 +269,34 @@ def add_to_goal(request, goal_id):
             if amount <= 0:
                 messages.error(request, 'Введите положительную сумму.')
             else:
-                goal.current_amount += amount
-                goal.save()
+                with db_transaction.atomic():
+                    expense = None
+                    if request.POST.get('as_expense'):
+                        # деньги ушли с баланса в копилку — расход, видимый в отчётах
+                        category_id = request.POST.get('category')
+                        expense = Transaction.objects.create(
+                            user=request.user,
+                            category=categories.filter(id=category_id).first() if category_id else None,
+                            amount=amount,
+                            description=f'Цель "{goal.name}"',
+                            type='expense',
+                        )
+                        rollups.apply(expense)
+                    GoalContribution.objects.create(goal=goal, user=request.user, amount=amount, transaction=expense)
+                    # UPDATE ... SET current_amount = current_amount + amount: одновременные
+                    # пополнения не затирают друг друга
+                    Goal.objects.filter(pk=goal.pk).update(current_amount=F('current_amount') + amount)
+                    if expense is None:
+                        ledger.bump(request.user.id)
                 messages.success(request, f'Добавлено {amount} сом к цели "{goal.name}".')
                 return redirect('main:goals_list')
         except (InvalidOperation, ValueError):
             messages.error(request, 'Некорректное значение суммы.')
 
-    return render(request, 'main/goals/add_to_goal.html', {'goal': goal})
+    contributions = goal.contributions.select_related('transaction').order_by('-created_at')[:10]
+    return render(request, 'main/goals/add_to_goal.html', {
+        'goal': goal, 'categories': categories, 'contributions': contributions,
+    })
 
 
 @login_required
@@ -226,12 +311,19 @@ def goal_edit(request, goal_id):
 
         try:
             goal.target_amount = Decimal(target_amount_str)
-            goal.current_amount = Decimal(current_amount_str)
+            current_amount = Decimal(current_amount_str)
         except (InvalidOperation, ValueError):
             messages.error(request, 'Некорректная сумма!')
             return render(request, 'main/goals/edit.html', {'goal': goal})
 
-        goal.save()
+        with db_transaction.atomic():
+            goal.save(update_fields=['name', 'target_amount', 'deadline'])
+            # новая сумма накоплений — исправляющим пополнением, чтобы их сумма сходилась
+            delta = current_amount - Goal.objects.filter(pk=goal.pk).values_list('current_amount', flat=True).get()
+            if delta:
+                GoalContribution.objects.create(goal=goal, user=request.user, amount=delta)
+                Goal.objects.filter(pk=goal.pk).update(current_amount=F('current_amount') + delta)
+            ledger.bump(request.user.id)
         messages.success(request, "Цель обновлена!")
         return redirect('main:goals_list')
 
@@ -243,102 +335,179 @@ def goal_delete(request, goal_id):
     goal = get_object_or_404(Goal, id=goal_id, user=request.user)
     if request.method == 'POST':
         goal.delete()
+        ledger.bump(request.user.id)
         messages.success(request, "Цель удалена.")
         return redirect('main:goals_list')
     return redirect('main:goals_list')
 
 
-@login_required
-def reports(request):
-    user = request.user
-    period = int(request.GET.get('period', 30))
-    today = date.today()
-    start_date = today - timedelta(days=period-1)
-
-    # Транзакции за выбранный период
-    transactions = Transaction.objects.filter(user=user, date__date__range=[start_date, today])
-
-    # Данные по дням
-    labels = []
-    income_data = []
-    expense_data = []
-
-    for i in range(period):
-        day = start_date + timedelta(days=i)
-        labels.append(day.strftime('%d.%m'))
-        daily_income = transactions.filter(type='income', date__date=day).aggregate(Sum('amount'))['amount__sum'] or 0
-        daily_expense = transactions.filter(type='expense', date__date=day).aggregate(Sum('amount'))['amount__sum'] or 0
-        income_data.append(float(daily_income))
-        expense_data.append(float(daily_expense))
-
-    # Суммарные значения
-    income = sum(income_data)
-    expenses = sum(expense_data)
-    balance = income - expenses
-
-    # Данные по категориям
-    income_categories = (
-        transactions.filter(type='income')
-        .values('category__name')
-        .annotate(total=Sum('amount'))
-    )
-    expense_categories = (
-        transactions.filter(type='expense')
-        .values('category__name')
-        .annotate(total=Sum('amount'))
-    )
+def _report_params(request):
+    """Период (в днях) и шаг графика из GET-параметров отчёта."""
+    try:
+        period = min(max(int(request.GET.get('period', 30)), 1), 3660)
+    except ValueError:
+        period = 30
+    step = request.GET.get('step', 'day')
+    if step not in STEPS:
+        step = 'day'
+    return period, step
 
-    # Преобразуем в списки для Chart.js
-    income_labels = [item['category__name'] for item in income_categories]
-    income_totals = [float(item['total']) for item in income_categories]
-
-    expense_labels = [item['category__name'] for item in expense_categories]
-    expense_totals = [float(item['total']) for item in expense_categories]
 
+@login_required
+def reports(request):
+    # Сами данные графиков и карточек страница забирает из JSON API ниже
+    period, step = _report_params(request)
     context = {
-        'income': income,
-        'expenses': expenses,
-        'balance': balance,
-        'labels': labels,
-        'income_data': income_data,
-        'expense_data': expense_data,
-        'today': today,
+        'today': timezone.localdate(),
         'period': period,
-        'income_labels': income_labels,
-        'income_totals': income_totals,
-        'expense_labels': expense_labels,
-        'expense_totals': expense_totals,
+        'step': step,
     }
     return render(request, 'main/reports.html', context)
 
 
 @login_required
-def transactions_list(request):
-    user = request.user
-    sort = request.GET.get('sort', '-date')  # сортировка по умолчанию: дата по убыванию
+async def reports_async(request):
+    """reports для ASGI: итоги, график и разбивка по категориям считаются одновременно
+    и сразу встраиваются в страницу, без трёх запросов к JSON API при открытии."""
+    user = await request.auser()
+    request.user = user
+    period, step = _report_params(request)
+    today = timezone.localdate()
+    start = today - timedelta(days=period-1)
+    totals = await ledger.aget(user)
+    period_totals, series, categories, forecast = await asyncio.gather(
+        dashboard.aperiod_totals(user, start, today, totals.version),
+        dashboard.aseries(user, start, today, step, totals.version),
+        dashboard.acategories(user, start, today, totals.version),
+        analytics.aforecast(user, today, totals.balance, totals.version),
+    )
+    return render(request, 'main/reports.html', {
+        'today': today,
+        'period': period,
+        'step': step,
+        'initial_charts': {
+            'summary': {'period': period_totals},
+            'series': series,
+            'categories': categories,
+            'forecast': _forecast_json(forecast),
+        },
+    })
+
+
+# --- JSON для графиков (reports.html, index.html) ---
+
+def _chart_etag(request, *args, **kwargs):
+    """ETag ответа: версия данных пользователя + сегодняшняя дата + параметры запроса.
+
+    Считается до вызова view, поэтому на совпавший If-None-Match отвечаем 304
+    без агрегации. Строку Ledger запоминаем, чтобы view не читал её второй раз.
+    """
+    request.ledger = ledger.get(request.user)
+    raw = '|'.join([
+        str(request.user.id),
+        str(request.ledger.version),
+        str(timezone.localdate()),
+        request.path,
+        urlencode(sorted(request.GET.items())),
+    ])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def chart_endpoint(view):
+    """login_required + ETag/If-None-Match + обязательная перепроверка кэша браузером."""
+    return login_required(cache_control(private=True, no_cache=True)(condition(etag_func=_chart_etag)(view)))
+
+
+@chart_endpoint
+def chart_series(request):
+    period, step = _report_params(request)
+    today = timezone.localdate()
+    data = dashboard.series(request.user, today - timedelta(days=period-1), today, step, request.ledger.version)
+    return JsonResponse(data)
+
+
+@chart_endpoint
+def chart_categories(request):
+    period, _ = _report_params(request)
+    today = timezone.localdate()
+    data = dashboard.categories(request.user, today - timedelta(days=period-1), today, request.ledger.version)
+    return JsonResponse(data)
+
+
+@chart_endpoint
+def chart_summary(request):
+    period, _ = _report_params(request)
+    today = timezone.localdate()
+    series = dashboard.series(request.user, today - timedelta(days=period-1), today, 'day', request.ledger.version)
+    income, expenses = sum(series['income']), sum(series['expense'])
+    return JsonResponse({
+        'period': {'income': income, 'expenses': expenses, 'balance': income - expenses},
+        'total': {
+            'income': float(request.ledger.income),
+            'expenses': float(request.ledger.expenses),
+            'balance': float(request.ledger.balance),
+        },
+    })
+
+
+def _forecast_json(forecast):
+    # сроки целей показывает goals_list; на странице отчётов нужен только темп накоплений
+    return {**forecast, 'goals': {'saving_rate': forecast['goals']['saving_rate']}}
+
+
+@chart_endpoint
+def chart_forecast(request):
+    """Скользящие средние, прогноз на конец месяца и темпы расходов по категориям."""
+    today = timezone.localdate()
+    forecast = analytics.forecast(request.user, today, request.ledger.balance, request.ledger.version)
+    return JsonResponse(_forecast_json(forecast))
+
+
+def _list_filters(request):
+    """Сортировка, категория и строка поиска из GET-параметров списка транзакций (общие для списка и выгрузки)."""
+    query = request.GET.get('q', '').strip()  # поиск по комментарию
+    if search.fts_query(query) is None:
+        query = ''  # нет ни одного слова от search.MIN_TERM символов
+    # сортировка по умолчанию: по релевантности при поиске, иначе дата по убыванию
+    sort = request.GET.get('sort') or ('rank' if query else '-date')
     category_id = request.GET.get('category', '')  # выбранная категория
 
     # разрешённые поля для сортировки
     allowed_sorts = ['date', '-date', 'amount', '-amount', 'type', '-type']
+    if query:
+        allowed_sorts.append('rank')
     if sort not in allowed_sorts:
         sort = '-date'
+    return sort, category_id, query
+
+
+@login_required
+def transactions_list(request):
+    user = request.user
+    sort, category_id, query = _list_filters(request)
 
     # получаем все категории пользователя для фильтра
     categories = Category.objects.filter(user=user)
 
-    # базовый queryset
-    transactions = Transaction.objects.filter(user=user)
+    # базовый queryset с фильтром по категории и поиском, если заданы
+    transactions = search.filtered(user, category_id, query).select_related('category')
 
-    # фильтр по категории, если выбрана
-    if category_id:
-        transactions = transactions.filter(category_id=category_id)
-
-    # применяем сортировку
-    transactions = transactions.order_by(sort)
+    # Подсчёт доходов и расходов (по отфильтрованным транзакциям): без поиска — по дневным
+    # итогам, с поиском — по найденным строкам (дневные итоги не знают комментариев)
+    if query:
+        totals = transactions.aggregate(
+            income=Sum('amount', filter=Q(type='income')),
+            expenses=Sum('amount', filter=Q(type='expense')),
+        )
+        income, expenses = ledger.cents(totals['income']), ledger.cents(totals['expenses'])
+    else:
+        rollup_rows = DailyRollup.objects.filter(user=user)
+        if category_id:
+            rollup_rows = rollup_rows.filter(category_id=category_id)
+        income, expenses = _totals(rollup_rows)
 
-    # Подсчёт доходов и расходов (по отфильтрованным транзакциям)
-    income = transactions.filter(type='income').aggregate(total=Sum('amount'))['total'] or 0
-    expenses = transactions.filter(type='expense').aggregate(total=Sum('amount'))['total'] or 0
+    # применяем сортировку и берём одну страницу после курсора
+    transactions, next_cursor = keyset_page(transactions, sort, request.GET.get('cursor'))
 
     total = income + expenses
     income_percent = round(income / total * 100, 1) if total else 0
@@ -346,21 +515,91 @@ def transactions_list(request):
 
     return render(request, 'main/transactions/list.html', {
         'transactions': transactions,
+        'types': Transaction._meta.get_field('type').choices,
         'income': income,
         'expenses': expenses,
         'income_percent': income_percent,
         'expense_percent': expense_percent,
         'current_sort': sort,
         'categories': categories,
-        'selected_category': category_id
+        'selected_category': category_id,
+        'query': query or request.GET.get('q', ''),
+        'error': (
+            f'Для поиска нужно слово от {search.MIN_TERM} символов'
+            if request.GET.get('q', '').strip() and not query else None
+        ),
+        # фильтры для ссылок сортировки, страниц и выгрузки
+        'filter_params': ''.join(
+            f'&{urlencode({name: value})}' for name, value in (('category', category_id), ('q', query)) if value
+        ),
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     })
 
+BULK_ACTIONS = {'category', 'type', 'delete'}
+
+
+@login_required
+def transactions_bulk(request):
+    """Массовое действие над отмеченными транзакциями или над всеми найденными по фильтру списка."""
+    sort, category_id, query = _list_filters(request)
+    params = {'sort': sort, 'category': category_id, 'q': query}
+    back = f"{reverse('main:transactions_list')}?{urlencode({name: value for name, value in params.items() if value})}"
+    action = request.POST.get('action')
+    if request.method != 'POST' or action not in BULK_ACTIONS:
+        return redirect(back)
+
+    if request.POST.get('all'):
+        selected = search.filtered(request.user, category_id, query).values('id')
+    else:
+        selected = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        if not selected:
+            messages.error(request, 'Отметьте транзакции.')
+            return redirect(back)
+    transactions = Transaction.objects.filter(id__in=selected)
+
+    if action == 'category':
+        target_id = request.POST.get('target_category')
+        target = get_object_or_404(Category, id=target_id, user=request.user) if target_id else None
+        count = bulk.recategorize(request.user, transactions, target)
+    elif action == 'type':
+        type_ = request.POST.get('target_type')
+        if type_ not in dict(Transaction._meta.get_field('type').choices):
+            return redirect(back)
+        count = bulk.change_type(request.user, transactions, type_)
+    else:
+        count = bulk.delete(request.user, transactions)
+    messages.success(request, f'Изменено транзакций: {count}' if action != 'delete' else f'Удалено транзакций: {count}')
+    return redirect(back)
+
+
+@login_required
+def transactions_export(request):
+    sort, category_id, query = _list_filters(request)
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in exporters.FORMATS:
+        fmt = 'csv'
+    if request.method == 'POST':
+        # выгрузка в файл фоновой задачей, скачивание — со страницы задачи
+        job = jobs.enqueue('export', request.user, format=fmt, sort=sort, category_id=category_id, query=query)
+        return redirect('main:job_detail', job.id)
+    lines, content_type, extension = exporters.FORMATS[fmt]
+
+    # тот же набор и порядок, что в списке; id — для стабильного порядка одинаковых значений
+    transactions = search.filtered(request.user, category_id, query).order_by(
+        sort, ('-' if sort.startswith('-') else '') + 'id'
+    )
+    response = StreamingHttpResponse(lines(transactions), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions.{extension}"'
+    return response
+
+
 @login_required
 def transaction_add(request, type):
-    # Получаем текущую локальную дату и время через time
-    now_struct = time.localtime()
-    now_date = time.strftime("%Y-%m-%d", now_struct)  # для input[type=date]
-    now_time = time.strftime("%H:%M", now_struct)     # для input[type=time]
+    # Текущие дата и время в зоне пользователя (её включает TimezoneMiddleware)
+    now = timezone.localtime()
+    now_date = now.strftime("%Y-%m-%d")  # для input[type=date]
+    now_time = now.strftime("%H:%M")     # для input[type=time]
     tz = timezone.get_current_timezone()
 
     categories = Category.objects.filter(user=request.user, type=type)
@@ -390,25 +629,25 @@ def transaction_add(request, type):
             naive_dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
         elif date_str:
             # если только дата — ставим текущее время
-            t = time.localtime()
-            naive_dt = datetime.strptime(date_str, "%Y-%m-%d").replace(hour=t.tm_hour, minute=t.tm_min)
+            naive_dt = datetime.strptime(date_str, "%Y-%m-%d").replace(hour=now.hour, minute=now.minute)
         elif time_str:
             # если только время — используем сегодняшнюю дату
-            today = time.strftime("%Y-%m-%d", now_struct)
-            naive_dt = datetime.strptime(f"{today} {time_str}", "%Y-%m-%d %H:%M")
+            naive_dt = datetime.strptime(f"{now_date} {time_str}", "%Y-%m-%d %H:%M")
         else:
-            naive_dt = datetime.fromtimestamp(time.mktime(now_struct))  # fallback
+            naive_dt = now.replace(tzinfo=None, second=0, microsecond=0)  # fallback
 
         datetime_obj = timezone.make_aware(naive_dt, tz)
 
-        Transaction.objects.create(
-            user=request.user,
-            category=category,
-            amount=amount,
-            description=description,
-            date=datetime_obj,
-            type=type
-        )
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                user=request.user,
+                category=category,
+                amount=amount,
+                description=description,
+                date=datetime_obj,
+                type=type
+            )
+            rollups.apply(transaction)
         messages.success(request, f"{type_display} добавлен: {amount} сом")
         return redirect('main:index')
 
@@ -421,6 +660,28 @@ def transaction_add(request, type):
     })
 
 
+@login_required
+def transaction_import(request):
+    error = None
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        fmt = request.POST.get('format') or (upload.name.rsplit('.', 1)[-1].lower() if upload else '')
+        if not upload:
+            error = "Выберите файл выписки."
+        elif fmt not in importers.PARSERS:
+            error = "Поддерживаются только файлы CSV и OFX."
+        else:
+            # разбор и запись — в фоновой задаче: большая выписка не упирается в таймаут воркера
+            name = f'import-{uuid.uuid4().hex}.{fmt}'
+            with open(jobs.path(name), 'wb') as f:
+                for chunk in upload.chunks():
+                    f.write(chunk)
+            job = jobs.enqueue('import', request.user, file=name, format=fmt)
+            return redirect('main:job_detail', job.id)
+
+    return render(request, 'main/transactions/import.html', {'error': error})
+
+
 @login_required
 def transaction_edit(request, pk):
     transaction = get_object_or_404(Transaction, id=pk, user=request.user)
@@ -437,22 +698,28 @@ def transaction_edit(request, pk):
             messages.error(request, "Некорректное значение суммы.")
             return redirect(request.path)
 
-        transaction.amount = amount
         category_id = request.POST.get('category')
-        transaction.category = Category.objects.filter(id=category_id, user=request.user).first()
-        transaction.description = request.POST.get('description')
-
-        date_str = request.POST.get('date')
-        time_str = request.POST.get('time')
-        if date_str and time_str:
-            try:
-                transaction.date = timezone.make_aware(
-                    timezone.datetime.fromisoformat(f"{date_str}T{time_str}")
-                )
-            except ValueError:
-                pass
-
-        transaction.save()
+        category = Category.objects.filter(id=category_id, user=request.user).first()
+
+        with db_transaction.atomic():
+            rollups.apply(transaction, -1)  # убираем старое состояние из итогов
+
+            transaction.amount = amount
+            transaction.category = category
+            transaction.description = request.POST.get('description')
+
+            date_str = request.POST.get('date')
+            time_str = request.POST.get('time')
+            if date_str and time_str:
+                try:
+                    transaction.date = timezone.make_aware(
+                        timezone.datetime.fromisoformat(f"{date_str}T{time_str}")
+                    )
+                except ValueError:
+                    pass
+
+            transaction.save()
+            rollups.apply(transaction)
         messages.success(request, "Транзакция обновлена!")
         return redirect('main:transactions_list')
 
@@ -463,18 +730,94 @@ def transaction_edit(request, pk):
 def transaction_delete(request, pk):
     transaction = get_object_or_404(Transaction, id=pk, user=request.user)
     if request.method == 'POST':
-        transaction.delete()
+        with db_transaction.atomic():
+            rollups.apply(transaction, -1)
+            transaction.delete()
         messages.success(request, "Транзакция удалена.")
         return redirect('main:transactions_list')
     return render(request, 'main/transactions/delete.html', {'transaction': transaction})
 
 
+@login_required
+def job_detail(request, job_id):
+    job = get_object_or_404(Job, id=job_id, user=request.user)
+    return render(request, 'main/jobs/detail.html', {'job': job})
+
+
+@login_required
+def job_status(request, job_id):
+    """Состояние задачи для опроса со страницы задачи."""
+    job = get_object_or_404(Job, id=job_id, user=request.user)
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'result': job.result,
+        'error': job.error,
+    })
+
+
+@login_required
+def job_download(request, job_id):
+    job = get_object_or_404(Job, id=job_id, user=request.user, kind='export', status='done')
+    name = job.result['file']
+    try:
+        f = open(jobs.path(name), 'rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(f, as_attachment=True, filename=f"transactions.{name.rsplit('.', 1)[-1]}")
+
+
+def static_file(request, path):
+    """Статика без отдельного веб-сервера: сжатая копия по Accept-Encoding, файлы с хэшем — immutable."""
+    found = assets.find(path, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        raise Http404(path)
+    full_path, encoding, cache_control = found
+    response = FileResponse(open(full_path, 'rb'), content_type=assets.content_type(path))
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+@staff_member_required
+def cache_stats(request):
+    return JsonResponse(datacache.stats())
+
+
+@staff_member_required
+def metrics_view(request):
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
 def categories_list(request):
-    categories = Category.objects.filter(user=request.user).order_by('type', 'name')
+    categories = list(Category.objects.filter(user=request.user).order_by('type', 'name'))
+    # потраченное за месяц по категориям с лимитом — из месячных итогов, одним запросом
+    budgets = {budget['id']: budget for budget in dashboard.budgets(request.user)}
+    for category in categories:
+        category.budget = budgets.get(category.id)
     return render(request, 'main/categories/list.html', {'categories': categories})
 
 
+def _monthly_limit(request, type_):
+    """Лимит из формы категории: None — без лимита (и у категорий доходов). ValueError — неверная сумма."""
+    value = request.POST.get('monthly_limit', '').strip()
+    if type_ != 'expense' or not value:
+        return None
+    try:
+        limit = Decimal(value)
+    except InvalidOperation:
+        raise ValueError
+    if limit <= 0:
+        raise ValueError
+    return limit
+
+
 @login_required
 def category_add(request):
     next_url = request.GET.get('next', reverse('main:index'))
@@ -486,9 +829,15 @@ def category_add(request):
         if not name:
             messages.error(request, 'Введите название категории.')
         else:
-            Category.objects.create(user=request.user, name=name, type=type_)
-            messages.success(request, 'Категория добавлена.')
-            return redirect(next_url)
+            try:
+                limit = _monthly_limit(request, type_)
+            except ValueError:
+                messages.error(request, 'Лимит должен быть положительной суммой.')
+            else:
+                Category.objects.create(user=request.user, name=name, type=type_, monthly_limit=limit)
+                ledger.bump(request.user.id)
+                messages.success(request, 'Категория добавлена.')
+                return redirect(next_url)
 
     return render(request, 'main/categories/add.html', {'next_url': next_url})
 
@@ -497,19 +846,41 @@ def category_add(request):
 def category_edit(request, pk):
     category = Category.objects.get(id=pk, user=request.user)
     if request.method == 'POST':
+        try:
+            limit = _monthly_limit(request, request.POST.get('type'))
+        except ValueError:
+            messages.error(request, 'Лимит должен быть положительной суммой.')
+            return redirect('main:category_edit', pk)
         category.name = request.POST.get('name')
         category.type = request.POST.get('type')
+        category.monthly_limit = limit
         category.save()
+        ledger.bump(request.user.id)
         messages.success(request, 'Категория обновлена.')
         return redirect('main:categories_list')
     return render(request, 'main/categories/edit.html', {'category': category})
 
 
+@login_required
+def category_merge(request, pk):
+    category = get_object_or_404(Category, id=pk, user=request.user)
+    targets = Category.objects.filter(user=request.user, type=category.type).exclude(id=pk).order_by('name')
+    if request.method == 'POST':
+        target = get_object_or_404(targets, id=request.POST.get('target'))
+        count = bulk.merge_categories(request.user, category, target)
+        messages.success(request, f'Категория «{category.name}» объединена с «{target.name}», перенесено транзакций: {count}.')
+        return redirect('main:categories_list')
+    return render(request, 'main/categories/merge.html', {'category': category, 'targets': targets})
+
+
 @login_required
 def category_delete(request, pk):
     category = Category.objects.get(id=pk, user=request.user)
     if request.method == 'POST':
-        category.delete()
+        with db_transaction.atomic():
+            rollups.move_category(request.user, category.id, None)  # транзакции станут «без категории»
+            category.delete()
+            ledger.bump(request.user.id)
         messages.success(request, 'Категория удалена.')
         return redirect('main:categories_list')
     return render(request, 'main/categories/delete.html', {'category': category})